@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+allocation.py
+
+Per-symbol capital allocation for the grid bot.
+
+Each cycle, for all symbols at once:
+  • volatility   – Parkinson estimate from the 24h high/low of the batched tickers
+  • spacing      – relative width of the grid band just under the current price
+  • fill rate    – completed grid_pairs per day over a lookback window
+  • bands        – how many grid levels a typical day's move spans, clipped
+  • usd/order    – the symbol's share of the budget (weighted by turnover)
+                   split across its bands
+"""
+
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger("allocation")
+
+TABLE = "band_allocations"
+
+# ─── DEFAULTS ──────────────────────────────────────────────────────────────────
+MIN_BANDS       = 1
+MAX_BANDS       = 4
+MIN_ORDER_USD   = 10.0     # stay clear of the exchange min-notional
+MAX_SHARE       = 0.25     # no symbol gets more than this share of the budget
+PRIOR_FILLS_DAY = 0.5      # pseudo fills/day so new or quiet pairs still get capital
+LOOKBACK_DAYS   = 7
+
+PARKINSON = 1.0 / math.sqrt(4.0 * math.log(2.0))
+
+# ─── PERSISTENCE ───────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        symbol          TEXT PRIMARY KEY,
+        bands           INTEGER NOT NULL,
+        usd_per_order   REAL NOT NULL,
+        weight          REAL,
+        updated         TIMESTAMP
+    )
+    """)
+
+def save_allocations(conn, alloc, updated):
+    ensure_table(conn)
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {TABLE} (symbol, bands, usd_per_order, weight, updated)
+        VALUES (?, ?, ?, ?, ?)
+    """, [
+        (sym, int(row.bands), float(row.usd_per_order), float(row.weight), updated)
+        for sym, row in alloc.iterrows()
+    ])
+    conn.commit()
+
+def load_band_limits(conn):
+    """Return {symbol: bands} as last decided by the bot (used by the prune script)."""
+    ensure_table(conn)
+    rows = conn.execute(f"SELECT symbol, bands FROM {TABLE}").fetchall()
+    return {sym: bands for sym, bands in rows}
+
+def load_fill_counts(conn, since):
+    """Completed pairs per symbol since `since`, in one grouped query."""
+    rows = conn.execute("""
+        SELECT symbol, COUNT(*) FROM grid_pairs
+         WHERE status = 'completed' AND sell_order_filled >= ?
+         GROUP BY symbol
+    """, (since,)).fetchall()
+    return {sym: n for sym, n in rows}
+
+# ─── INPUTS ────────────────────────────────────────────────────────────────────
+def band_spacing(grid, price):
+    """Relative width of the first band under `price` (grid is a grid_format.PriceGrid)."""
+    below = grid.below(price)
+    if not below:
+        return float("nan")
+    buy, sell = below[0]
+    return (sell - buy) / buy
+
+def build_stats(tickers, spacings, fills, config=None):
+    """One row per symbol in `spacings`, ready for compute_allocations()."""
+    config = config or {}
+    rows = {}
+    for sym, spacing in spacings.items():
+        t = tickers.get(sym) or {}
+        cfg = config.get(sym, {})
+        rows[sym] = {
+            "high":      t.get("high"),
+            "low":       t.get("low"),
+            "last":      t.get("last"),
+            "spacing":   spacing,
+            "fills":     fills.get(sym, 0),
+            "max_bands": cfg.get("max_bands", MAX_BANDS),
+            "percent":   cfg.get("allocation_percent", 1.0),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+# ─── ENGINE ────────────────────────────────────────────────────────────────────
+def cap_shares(share, cap):
+    """
+    Clip each share at its cap and give what was cut to the uncapped symbols,
+    in proportion to their shares, until nothing more goes over. The total is
+    kept unless every symbol ends up capped.
+    """
+    share  = np.array(share, dtype=float)
+    total  = share.sum()
+    capped = np.zeros(len(share), dtype=bool)
+    while True:
+        over = ~capped & (share > cap)
+        if not over.any():
+            return share
+        capped |= over
+        share[capped] = cap[capped]
+        free = ~capped
+        room = share[free].sum()
+        if room <= 0:
+            return share
+        share[free] *= (total - share[capped].sum()) / room
+
+def compute_allocations(stats, budget_usd,
+                        min_bands=MIN_BANDS, max_bands=MAX_BANDS,
+                        min_order_usd=MIN_ORDER_USD, max_share=MAX_SHARE,
+                        prior_fills_day=PRIOR_FILLS_DAY, lookback_days=LOOKBACK_DAYS):
+    """
+    `stats` is a DataFrame indexed by symbol with columns
+    high, low, last, spacing (relative band width) and fills (completed pairs
+    in the lookback window), plus optional per-symbol max_bands and percent
+    (configured allocation_percent, used as a relative weight). Returns a
+    DataFrame with bands, usd_per_order and weight per symbol.
+    """
+    high    = stats["high"].to_numpy(dtype=float)
+    low     = stats["low"].to_numpy(dtype=float)
+    spacing = stats["spacing"].to_numpy(dtype=float)
+    fills   = stats["fills"].fillna(0).to_numpy(dtype=float)
+    if "max_bands" in stats:
+        max_bands = stats["max_bands"].to_numpy(dtype=float)
+    percent = stats["percent"].to_numpy(dtype=float) if "percent" in stats else np.ones(len(stats))
+    percent = percent / percent.sum() if percent.sum() > 0 else np.full(len(stats), 1.0 / max(len(stats), 1))
+
+    valid = (high > 0) & (low > 0) & (high >= low) & (spacing > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol = np.where(valid, np.log(high / low) * PARKINSON, 0.0)
+
+        # grid levels a typical day's move spans → how many bands are useful
+        levels = np.where(valid, vol / spacing, 0.0)
+        bands = np.clip(np.ceil(levels), min_bands, max_bands)
+
+        # capital follows turnover: fills/day × profit per fill (≈ spacing),
+        # scaled by the configured percent. Symbols we can't score (no ticker /
+        # no band under price) keep their configured share.
+        n = max(len(valid), 1)
+        fill_rate = fills / lookback_days + prior_fills_day
+        weight = np.where(valid, fill_rate * spacing * percent, 0.0)
+        total = weight.sum()
+        scored = weight / total * percent[valid].sum() if total > 0 else np.zeros_like(weight)
+        share = np.where(valid, scored, percent)
+    share = cap_shares(share, np.maximum(max_share, percent))
+
+    budget = share * budget_usd
+    # don't split a budget into orders below the min-notional
+    affordable = np.floor(budget / min_order_usd)
+    bands = np.maximum(np.minimum(bands, affordable), min_bands)
+    usd_per_order = np.round(budget / bands, 4)
+
+    return pd.DataFrame({
+        "vol":           vol,
+        "spacing":       spacing,
+        "fill_rate":     fill_rate,
+        "weight":        share,
+        "bands":         bands.astype(int),
+        "usd_per_order": usd_per_order,
+    }, index=stats.index)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+band_events.py
+
+Append-only audit log of every band's lifecycle, with snapshots for fast
+point-in-time queries.
+
+Every transition of a grid_pairs row is written to band_events before (or in
+the same transaction as) the row changes - including the rows that get
+DELETEd, so why a band went away survives in the DB, not just the text logs.
+Event types are small integers (EVENT_NAMES has the labels).
+
+"State of all bands at time T" = the newest snapshot at or before T plus the
+events after it, so a query never replays more than SNAPSHOT_EVERY events.
+Snapshots hold only live bands; closed bands drop out of them.
+"""
+
+import logging
+
+import clock
+
+log = logging.getLogger("band_events")
+
+TABLE          = "band_events"
+SNAPSHOTS      = "band_snapshots"
+SNAPSHOT_ROWS  = "band_snapshot_rows"
+
+# ─── EVENT CODES ───────────────────────────────────────────────────────────────
+SEEDED        = 1    # buy on the book
+BUY_PARTIAL   = 2    # buy part-filled, still on the book
+BUY_FILLED    = 3    # buy done, waiting for its sell
+SELL_PLACED   = 4    # sell on the book
+SELL_REOPENED = 5    # sell left the book unfilled/part-filled, back to waiting for a sell
+COMPLETED     = 6    # sell filled, pair done
+CANCELLED     = 7    # buy cancelled (band moved out of range, exchange cancel/expiry)
+PRUNED        = 8    # excess band removed by prune_excess_bands.py
+REMOVED       = 9    # removed by hand (remove_* scripts)
+REJECTED      = 10   # buy never went live (exchange rejection, unresolved intent)
+DUST          = 11   # bought amount under the market minimums, kept as dust (no sell)
+
+EVENT_NAMES = {
+    SEEDED: "seeded", BUY_PARTIAL: "buy_partial", BUY_FILLED: "buy_filled",
+    SELL_PLACED: "sell_placed", SELL_REOPENED: "sell_reopened", COMPLETED: "completed",
+    CANCELLED: "cancelled", PRUNED: "pruned", REMOVED: "removed", REJECTED: "rejected",
+    DUST: "dust",
+}
+
+# The band no longer exists after these
+TERMINAL = {COMPLETED, CANCELLED, PRUNED, REMOVED, REJECTED, DUST}
+
+SNAPSHOT_EVERY = 5000   # events between snapshots
+
+# ─── SCHEMA ────────────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        at          REAL NOT NULL,
+        pair_id     INTEGER NOT NULL,
+        symbol      TEXT NOT NULL,
+        event       INTEGER NOT NULL,
+        price       REAL,
+        amount      REAL,
+        order_id    TEXT,
+        detail      TEXT
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_pair ON {TABLE} (pair_id, id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_at ON {TABLE} (at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_symbol ON {TABLE} (symbol, at)")
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SNAPSHOTS} (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        at              REAL NOT NULL,
+        last_event_id   INTEGER NOT NULL
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {SNAPSHOTS}_at ON {SNAPSHOTS} (at)")
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SNAPSHOT_ROWS} (
+        snapshot_id INTEGER NOT NULL,
+        pair_id     INTEGER NOT NULL,
+        symbol      TEXT NOT NULL,
+        event       INTEGER NOT NULL,
+        at          REAL NOT NULL,
+        price       REAL,
+        amount      REAL,
+        order_id    TEXT,
+        PRIMARY KEY (snapshot_id, pair_id)
+    ) WITHOUT ROWID
+    """)
+
+# ─── WRITE ─────────────────────────────────────────────────────────────────────
+def record_many(conn, events, at=None):
+    """
+    events: [(pair_id, symbol, event, price, amount, order_id, detail), ...].
+    Caller commits (so the event lands with the row change it describes).
+    """
+    at = clock.time() if at is None else at
+    conn.executemany(f"""
+        INSERT INTO {TABLE} (at, pair_id, symbol, event, price, amount, order_id, detail)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(at, *e) for e in events])
+
+def record(conn, pair_id, symbol, event, price=None, amount=None, order_id=None, detail=None, at=None):
+    record_many(conn, [(pair_id, symbol, event, price, amount, order_id, detail)], at)
+
+# ─── READ ──────────────────────────────────────────────────────────────────────
+def history(conn, pair_id):
+    """[(at, event name, price, amount, order_id, detail), ...] for one band, oldest first."""
+    rows = conn.execute(f"""
+        SELECT at, event, price, amount, order_id, detail FROM {TABLE}
+         WHERE pair_id = ? ORDER BY id
+    """, (pair_id,)).fetchall()
+    return [(at, EVENT_NAMES.get(ev, ev), *rest) for at, ev, *rest in rows]
+
+def _latest_snapshot(conn, at):
+    return conn.execute(f"""
+        SELECT id, last_event_id FROM {SNAPSHOTS}
+         WHERE at <= ? ORDER BY at DESC, id DESC LIMIT 1
+    """, (at,)).fetchone()
+
+def state_at(conn, at, symbol=None):
+    """
+    {pair_id: (symbol, event, at, price, amount, order_id)} for every band that
+    was live at unix time `at` - its last event up to then.
+    """
+    snap = _latest_snapshot(conn, at)
+    state = {}
+    after = 0
+    if snap:
+        snapshot_id, after = snap
+        for pair_id, sym, ev, ev_at, price, amount, order_id in conn.execute(f"""
+            SELECT pair_id, symbol, event, at, price, amount, order_id FROM {SNAPSHOT_ROWS}
+             WHERE snapshot_id = ?
+        """, (snapshot_id,)):
+            state[pair_id] = (sym, ev, ev_at, price, amount, order_id)
+
+    for pair_id, sym, ev, ev_at, price, amount, order_id in conn.execute(f"""
+        SELECT pair_id, symbol, event, at, price, amount, order_id FROM {TABLE}
+         WHERE id > ? AND at <= ? ORDER BY id
+    """, (after, at)):
+        if ev in TERMINAL:
+            state.pop(pair_id, None)
+            continue
+        prev = state.get(pair_id)
+        # later events may omit the band's price/amount; keep what we knew
+        state[pair_id] = (sym, ev, ev_at,
+                          price if price is not None else (prev[3] if prev else None),
+                          amount if amount is not None else (prev[4] if prev else None),
+                          order_id if order_id is not None else (prev[5] if prev else None))
+
+    if symbol is not None:
+        state = {pid: s for pid, s in state.items() if s[0] == symbol}
+    return state
+
+# ─── SNAPSHOTS ─────────────────────────────────────────────────────────────────
+def materialize_snapshot(conn, at=None):
+    """Write the live-band state as of `at` (default now) as a snapshot; returns its id."""
+    at = clock.time() if at is None else at
+    last = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE} WHERE at <= ?", (at,)).fetchone()[0]
+    state = state_at(conn, at)
+    with conn:
+        cur = conn.execute(f"INSERT INTO {SNAPSHOTS} (at, last_event_id) VALUES (?, ?)", (at, last))
+        snapshot_id = cur.lastrowid
+        conn.executemany(f"""
+            INSERT INTO {SNAPSHOT_ROWS} (snapshot_id, pair_id, symbol, event, at, price, amount, order_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(snapshot_id, pid, *s) for pid, s in state.items()])
+    log.info(f"📸 Band snapshot {snapshot_id}: {len(state)} live band(s) through event {last}")
+    return snapshot_id
+
+def maybe_snapshot(conn, every=SNAPSHOT_EVERY):
+    """Snapshot once `every` events have accumulated since the last one."""
+    since = conn.execute(f"SELECT COALESCE(MAX(last_event_id), 0) FROM {SNAPSHOTS}").fetchone()[0]
+    pending = conn.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE id > ?", (since,)).fetchone()[0]
+    if pending >= every:
+        return materialize_snapshot(conn)
+    return None
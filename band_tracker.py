@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+band_tracker.py
+
+Decides which symbols need band maintenance (seed_grid_for_symbol,
+set_band_close) this cycle.
+
+Both passes are a function of the band the price sits in and of the symbol's
+rows, so they only have work to do when, since the symbol was last maintained:
+  • crossed  – the price moved across a grid level (grid.band_index changed)
+  • events   – one of its bands changed state: fill, cancel, prune, rejected
+               order... (anything written to band_events)
+  • bands    – the allocation gave it a different band count
+  • grid     – its grid file changed
+A quiet market costs one bisect per symbol and one indexed query per cycle.
+Nothing goes unmaintained for longer than MAX_IDLE_MINUTES.
+
+CrossingDetector is the price half on its own: fed a symbol's price, it says
+whether it left the band the symbol was last maintained in.
+"""
+
+import logging
+from datetime import datetime
+
+log = logging.getLogger("band_tracker")
+
+TABLE = "band_cursor"
+
+# ─── DEFAULTS ──────────────────────────────────────────────────────────────────
+MAX_IDLE_MINUTES = 60      # maintain every symbol at least this often regardless
+
+# ─── PERSISTENCE ───────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        symbol          TEXT PRIMARY KEY,
+        band_index      INTEGER NOT NULL,
+        bands           INTEGER NOT NULL,
+        grid            TEXT NOT NULL,
+        event_id        INTEGER NOT NULL,
+        maintained_at   TIMESTAMP NOT NULL
+    )
+    """)
+
+def load_cursors(conn):
+    """{symbol: (band_index, bands, grid, event_id, maintained_at)} as of each symbol's last maintenance."""
+    ensure_table(conn)
+    rows = conn.execute(f"SELECT symbol, band_index, bands, grid, event_id, maintained_at FROM {TABLE}").fetchall()
+    return {sym: (k, bands, grid, ev, datetime.fromisoformat(str(ts))) for sym, k, bands, grid, ev, ts in rows}
+
+def mark_maintained(conn, symbol, band_index, bands, grid, now):
+    """Call after the passes ran, so the events they wrote count as seen."""
+    ensure_table(conn)
+    event_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM band_events").fetchone()[0]
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {TABLE} (symbol, band_index, bands, grid, event_id, maintained_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (symbol, band_index, bands, grid, event_id, now))
+    conn.commit()
+
+def events_since(conn, event_id):
+    """{symbol: newest band_events id} for symbols with events after `event_id` (a PK range scan)."""
+    return dict(conn.execute("""
+        SELECT symbol, MAX(id) FROM band_events WHERE id > ? GROUP BY symbol
+    """, (event_id,)).fetchall())
+
+def grid_signature(cfg, grid):
+    return f"{cfg['grid_file']}:{len(grid.levels)}"
+
+# ─── DETECTOR ──────────────────────────────────────────────────────────────────
+class CrossingDetector:
+    """Last maintained band index per symbol; flags prices that left it."""
+
+    def __init__(self, indexes=None):
+        self.indexes = dict(indexes or {})
+
+    def crossed(self, symbol, grid, price):
+        """(band index of `price`, whether it differs from the last maintained one)."""
+        k = grid.band_index(price)
+        return k, self.indexes.get(symbol) != k
+
+# ─── PLAN ──────────────────────────────────────────────────────────────────────
+def plan_maintenance(conn, tickers, grids, config, now, max_idle_minutes=MAX_IDLE_MINUTES):
+    """
+    {symbol: (band_index, maintain, reason)} for every symbol in `grids`.
+    `tickers` are the cycle's batched tickers; band_index is None when the
+    symbol has no price in them.
+    """
+    cursors  = load_cursors(conn)
+    detector = CrossingDetector({sym: c[0] for sym, c in cursors.items()})
+    oldest   = min((c[3] for sym, c in cursors.items() if sym in grids), default=0)
+    events   = events_since(conn, oldest)
+
+    plan = {}
+    for sym, grid in grids.items():
+        price = ((tickers or {}).get(sym) or {}).get("last")
+        if not price:
+            plan[sym] = (None, True, "no price")
+            continue
+        k, crossed = detector.crossed(sym, grid, float(price))
+        cursor = cursors.get(sym)
+        if cursor is None:
+            plan[sym] = (k, True, "never maintained")
+            continue
+        last_k, bands, sig, event_id, maintained_at = cursor
+        minutes = (now - maintained_at).total_seconds() / 60.0
+        if crossed:
+            plan[sym] = (k, True, f"crossed band {last_k} → {k}")
+        elif events.get(sym, 0) > event_id:
+            plan[sym] = (k, True, "band events since last pass")
+        elif bands != config[sym].get("bands", 1):
+            plan[sym] = (k, True, f"bands {bands} → {config[sym].get('bands', 1)}")
+        elif sig != grid_signature(config[sym], grid):
+            plan[sym] = (k, True, "grid changed")
+        elif minutes >= max_idle_minutes:
+            plan[sym] = (k, True, f"idle for {minutes:.0f} min")
+        else:
+            plan[sym] = (k, False, f"still in band {k}, {minutes:.0f} min since last pass")
+    return plan
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+
+Cold-start benchmark for bot.py and the tools, from `python -X importtime`.
+
+  • Each module is imported in a fresh interpreter `--runs` times; the best
+    run is reported (least disturbed by the rest of the machine)
+  • Shows total import time, process wall time and the heaviest direct
+    imports, so a new eager import or import-time side effect stands out
+  • `--record` appends the results as one JSON line to track them over time;
+    `--budget-ms` exits non-zero when any module imports slower than that
+
+Usage:
+  ./bench_startup.py
+  ./bench_startup.py bot --runs 10
+  ./bench_startup.py --record startup.jsonl --budget-ms 800
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+MODULES = ["bot", "prune_excess_bands", "remove_losers", "shard_runner", "make_grid", "grid_config"]
+TOP_N   = 5
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ─── MEASURE ───────────────────────────────────────────────────────────────────
+def parse_importtime(stderr):
+    """[(depth, module, cumulative µs), ...] in the order -X importtime prints them."""
+    entries = []
+    for line in stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        _self_us, cumulative, name = parts
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+def direct_imports(entries, module):
+    """Cumulative µs of each import made directly by `module` (children print before parents)."""
+    names = [name for depth, name, _ in entries]
+    if module not in names:
+        return 0, {}
+    i = names.index(module)
+    children = {}
+    for depth, name, us in reversed(entries[:i]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children[name] = us
+    return entries[i][2], children
+
+def measure(module):
+    """(import ms, wall ms, {direct import: ms}) for one fresh interpreter."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    total_us, children = direct_imports(parse_importtime(proc.stderr), module)
+    return total_us / 1000, wall, {m: us / 1000 for m, us in children.items()}
+
+def bench(module, runs):
+    best = min((measure(module) for _ in range(runs)), key=lambda r: r[0])
+    imports_ms, wall_ms, deps = best
+    heaviest = sorted(deps.items(), key=lambda kv: kv[1], reverse=True)[:TOP_N]
+    return {"module": module, "import_ms": round(imports_ms, 1), "wall_ms": round(wall_ms, 1),
+            "heaviest": [[m, round(ms, 1)] for m, ms in heaviest]}
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the bot and tools.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--record", help="append results as a JSON line to this file")
+    parser.add_argument("--budget-ms", type=float, help="fail if any module's import time exceeds this")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        r = bench(module, max(args.runs, 1))
+        results.append(r)
+        deps = ", ".join(f"{m} {ms:.0f}" for m, ms in r["heaviest"])
+        print(f"{module:<20} import {r['import_ms']:8.1f} ms   wall {r['wall_ms']:8.1f} ms   [{deps}]")
+
+    if args.record:
+        with open(args.record, "a") as f:
+            f.write(json.dumps({"at": datetime.now(timezone.utc).isoformat(), "python": sys.version.split()[0],
+                                "results": results}) + "\n")
+
+    over = [r["module"] for r in results if args.budget_ms and r["import_ms"] > args.budget_ms]
+    if over:
+        print(f"Over budget ({args.budget_ms:.0f} ms): {', '.join(over)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
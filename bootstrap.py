@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+bootstrap.py
+
+Process start-up shared by bot.py and the tools. Nothing here runs at import:
+each script calls these from its entry point (or from a lazy accessor), so
+importing a module for one helper never touches the network, sockets or logs.
+
+  • force_ipv4()      – resolve exchange hosts over IPv4 only (once per process)
+  • setup_logging()   – file + console logging, the format every script uses
+  • build_exchange()  – ccxt client behind the shared scheduler and the retry layer
+"""
+
+import socket
+import logging
+
+_ipv4_forced = False
+
+# ─── NETWORK ───────────────────────────────────────────────────────────────────
+def force_ipv4():
+    global _ipv4_forced
+    if _ipv4_forced:
+        return
+    _orig_getaddrinfo = socket.getaddrinfo
+    def _getaddrinfo_ipv4(host, port, family=0, type=0, proto=0, flags=0):
+        return _orig_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
+    socket.getaddrinfo = _getaddrinfo_ipv4
+    _ipv4_forced = True
+
+# ─── LOGGING ───────────────────────────────────────────────────────────────────
+def setup_logging(path):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[
+            logging.FileHandler(path, encoding="utf-8"),
+            logging.StreamHandler()
+        ]
+    )
+
+# ─── EXCHANGE ──────────────────────────────────────────────────────────────────
+def build_exchange(exchange_id, api_key=None, secret=None):
+    """
+    Throttling is done by the shared scheduler (see rate_limiter.py), not ccxt;
+    retries and circuit breakers sit on top of it (see resilience.py). The raw
+    client is timed per endpoint when profiling is on (see profiling.py) and
+    can be recorded or replayed (see exchange_tape.py), or swapped for a
+    simulated market (see sim_market.py); replays and simulations run with no
+    rate budget and no back-off.
+    """
+    import ccxt
+    from exchange_tape import FreeRunLimiter, is_replaying, wrap_client
+    from profiling import ProfiledExchange
+    from rate_limiter import RateLimiter, ScheduledExchange
+    from resilience import ResilientExchange, RetryPolicy
+    from sim_market import is_simulating, simulated_client
+
+    force_ipv4()
+    raw = getattr(ccxt, exchange_id)({
+        "apiKey":          api_key,
+        "secret":          secret,
+        "enableRateLimit": False,
+    })
+    client = ProfiledExchange(simulated_client(raw) if is_simulating() else wrap_client(raw))
+    if is_replaying() or is_simulating():
+        return ResilientExchange(ScheduledExchange(client, FreeRunLimiter()),
+                                 RetryPolicy(base_delay=0.0, max_delay=0.0), cooldown=0.0)
+    return ResilientExchange(ScheduledExchange(client, RateLimiter.for_exchange(exchange_id)))
@@ -1,168 +1,430 @@
 #!/usr/bin/env python3
 import os
-import socket
 import time
 import logging
 import sqlite3
 import json
-from datetime import datetime,timezone
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-import ccxt
 from dotenv import load_dotenv
 
-# ─── FORCE IPv4 ────────────────────────────────────────────────────────────────
-_orig_getaddrinfo = socket.getaddrinfo
-def _getaddrinfo_ipv4(host, port, family=0, type=0, proto=0, flags=0):
-    return _orig_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
-socket.getaddrinfo = _getaddrinfo_ipv4
+import clock
+from bootstrap import build_exchange, setup_logging
+from order_journal import (
+    STATE_FAILED, STATE_RECORDED, has_open_intent, mark, open_intents, write_intent,
+)
+from order_journal import ensure_table as ensure_journal_table
+from order_payloads import ensure_table as ensure_payload_table, save_payloads, migrate_raw_json
+from band_events import (
+    BUY_FILLED, BUY_PARTIAL, CANCELLED, COMPLETED, DUST, REJECTED, SEEDED, SELL_PLACED, SELL_REOPENED,
+    maybe_snapshot, record, record_many,
+)
+from band_events import ensure_table as ensure_events_table
+from grid_config import CONFIG_PATH, ConfigWatcher, get_config
+from grid_format import load_grid
+from fill_model import mark_reconciled, plan_reconciliation
+from band_tracker import grid_signature, mark_maintained, plan_maintenance
+from band_tracker import ensure_table as ensure_cursor_table
+from profiling import MODES as PROFILE_MODES, profile_run, profiled
+# fills.py and allocation.py pull in pandas, and ccxt (via rate_limiter.py too)
+# is most of a cold import; they are imported where first used
 
 # ─── ENVIRONMENT ───────────────────────────────────────────────────────────────
 load_dotenv()
 API_KEY    = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
 
-# ─── CONFIG ─────────────────────────────────────────────────────────────────────
-CONFIG = {
-    "ETH/USDT": {"grid_file": "ETH-USDT-06.csv"},
-    "BTC/USDT": {"grid_file": "BTC-USDT-05.csv"},
-    "DOGE/USDT": {"grid_file": "DOGE-USDT-10.csv"},
-    "UNI/USDT": {"grid_file": "UNI-USDT-10.csv"},
-    "SOL/USDT": {"grid_file": "SOL-USDT-10.csv"},
-    "XRP/USDT": {"grid_file": "XRP-USDT-10.csv"},
-    "SHIB/USDT": {"grid_file": "SHIB-USDT-10.csv"},
-    "ADA/USDT": {"grid_file": "ADA-USDT-06.csv"},
-    "LINK/USDT": {"grid_file": "LINK-USDT-10.csv"},
-    "DOT/USDT": {"grid_file": "DOT-USDT-11.csv"},
-    "LTC/USDT": {"grid_file": "LTC-USDT-08.csv"},
-    "AAVE/USDT": {"grid_file": "AAVE-USDT-12.csv"},
-    "BNB/USDT": {"grid_file": "BNB-USDT-04.csv"},
-    "FET/USDT": {"grid_file": "FET-USDT-10.csv"},
-    "OP/USDT": {"grid_file": "OP-USDT-10.csv"},
-    "ARB/USDT": {"grid_file": "ARB-USDT-06.csv"},
-    "CRV/USDT": {"grid_file": "CRV-USDT-10.csv"},
-}
+# Overridden per worker by shard_runner.py; the defaults are the single-process setup
+EXCHANGE_ID = os.getenv("GRIDBOT_EXCHANGE", "binanceus")
+DB_PATH     = os.getenv("GRIDBOT_DB", "gridbot_pairs.sqlite3")
+LOG_PATH    = os.getenv("GRIDBOT_LOG", "gridbot.log")
 
 # ─── LOGGING ───────────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[
-        logging.FileHandler("gridbot.log", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# Handlers are attached by the entry point (setup_logging), not at import
 log = logging.getLogger("gridbot")
 
-# ─── EXCHANGE INIT ─────────────────────────────────────────────────────────────
-exchange = ccxt.binanceus({
-    "apiKey":          API_KEY,
-    "secret":          API_SECRET,
-    "enableRateLimit": True,
-})
-markets = exchange.load_markets()
+# ─── LAZY STATE ────────────────────────────────────────────────────────────────
+# Exchange client, markets and DB are built on first use and cached, so
+# importing this module is cheap and offline.
+_exchange = None
+_markets  = None
+_db       = None
+
+def get_exchange():
+    global _exchange
+    if _exchange is None:
+        _exchange = build_exchange(EXCHANGE_ID, API_KEY, API_SECRET)
+    return _exchange
+
+def get_markets():
+    global _markets
+    if _markets is None:
+        _markets = get_exchange().load_markets()
+    return _markets
+
+def get_db():
+    global _db
+    if _db is None:
+        _db = open_db(DB_PATH)
+    return _db
+
+def close_db():
+    global _db
+    if _db is not None:
+        _db.close()
+        _db = None
 
 # ─── DB INIT ───────────────────────────────────────────────────────────────────
-DB = sqlite3.connect("gridbot_pairs.sqlite3", check_same_thread=False)
-DB.execute("""
-CREATE TABLE IF NOT EXISTS grid_pairs (
-    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
-    symbol                  TEXT NOT NULL,
-
-    buy_trade_id            TEXT,
-    buy_order_id            TEXT,
-    buy_order_submitted     TIMESTAMP,
-    buy_order_filled        TIMESTAMP,
-    buy_amount              REAL,
-    buy_price               REAL,
-    buy_cost                REAL,
-    buy_fee_cost            REAL,
-    buy_fee_currency        TEXT,
-    buy_fees                INTEGER,
-    buy_fees_data           TEXT,
-
-    sell_trade_id           TEXT,
-    sell_order_id           TEXT,
-    sell_order_submitted    TIMESTAMP,
-    sell_order_filled       TIMESTAMP,
-    sell_amount             REAL,
-    sell_price              REAL,
-    sell_cost               REAL,
-    sell_fee_cost           REAL,
-    sell_fee_currency       TEXT,
-    sell_fees               INTEGER,
-    sell_fees_data          TEXT,
-
-    buy_raw_json            TEXT,
-    sell_raw_json           TEXT,
-    status                  TEXT
-)
-""")
-
-DB.commit()
+# Columns added after the table was first created (same idea as add_cols.py)
+def ensure_columns(conn, table, columns):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for col_name, col_type in columns:
+        if col_name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}")
+
+def open_db(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS grid_pairs (
+        id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol                  TEXT NOT NULL,
+
+        buy_trade_id            TEXT,
+        buy_order_id            TEXT,
+        buy_order_submitted     TIMESTAMP,
+        buy_order_filled        TIMESTAMP,
+        buy_amount              REAL,
+        buy_price               REAL,
+        buy_cost                REAL,
+        buy_fee_cost            REAL,
+        buy_fee_currency        TEXT,
+        buy_fees                INTEGER,
+        buy_fees_data           TEXT,
+
+        sell_trade_id           TEXT,
+        sell_order_id           TEXT,
+        sell_order_submitted    TIMESTAMP,
+        sell_order_filled       TIMESTAMP,
+        sell_amount             REAL,
+        sell_price              REAL,
+        sell_cost               REAL,
+        sell_fee_cost           REAL,
+        sell_fee_currency       TEXT,
+        sell_fees               INTEGER,
+        sell_fees_data          TEXT,
+
+        buy_raw_json            TEXT,   -- legacy: payloads live in order_payloads
+        sell_raw_json           TEXT,   -- legacy: payloads live in order_payloads
+        status                  TEXT
+    )
+    """)
+    ensure_columns(conn, "grid_pairs", [
+        ("buy_client_order_id", "TEXT"),
+        ("sell_client_order_id", "TEXT"),
+        ("buy_filled_amount", "REAL"),
+        ("buy_net_amount", "REAL"),
+    ])
+    # Symbols with bands in flight, however many completed rows pile up (see wind_down_symbols)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS grid_pairs_live ON grid_pairs (symbol)
+     WHERE status NOT IN ('completed', 'dust')
+    """)
+    ensure_journal_table(conn)
+    ensure_payload_table(conn)
+    ensure_events_table(conn)
+    ensure_cursor_table(conn)
+    conn.commit()
+    # Raw order JSON lives in order_payloads now; move anything still inline
+    migrate_raw_json(conn)
+    return conn
+
+# Concurrent order submissions when the exchange has no batch endpoint
+MAX_CONCURRENT_ORDERS = 4
+
+# Fee-currency → quote prices, fetched at most once per cycle (cleared by _run_cycle)
+_FEE_RATES = {}
+
+# The current cycle's batched tickers (set by run_cycle)
+_CYCLE_TICKERS = {}
+
+# Per-market lot, notional and fee rules (see sizing.py), built once from the markets
+_SIZING_RULES = {}
 
 # ─── HELPERS ───────────────────────────────────────────────────────────────────
 
+def fetch_rows(sql, args=()):
+    """Rows addressable by column name (sqlite3.Row), without a dict per row."""
+    cur = get_db().cursor()
+    cur.row_factory = sqlite3.Row
+    return cur.execute(sql, args).fetchall()
+
 def load_price_grid(path):
-    with open(path, newline="") as f:
-        prices = sorted(float(line.strip()) for line in f if line.strip())
-    return list(reversed([(prices[i], prices[i+1]) for i in range(len(prices)-1)]))
+    """Bands (buy, sell), highest first; reads the binary .grid when present (cached)."""
+    return load_grid(path)
+
+# Per-symbol grid index; entries are dropped/rebuilt by apply_config_changes()
+_GRIDS = {}
+
+def grid_for(sym, cfg):
+    grid = _GRIDS.get(sym)
+    if grid is None:
+        grid = _GRIDS[sym] = load_price_grid(os.path.join("grids", cfg["grid_file"]))
+    return grid
 
 def get_price(sym):
-    return float(exchange.fetch_ticker(sym)["last"])
+    return float(get_exchange().fetch_ticker(sym)["last"])
+
+def cycle_price(sym):
+    """Last price from this cycle's batched tickers; a live fetch if the symbol isn't in them."""
+    last = (_CYCLE_TICKERS.get(sym) or {}).get("last")
+    return float(last) if last else get_price(sym)
+
+def sizing_rules(sym):
+    if not _SIZING_RULES:
+        import ccxt
+        from sizing import build_rules  # pulls in numpy; only needed once orders are sized
+        _SIZING_RULES.update(build_rules(get_markets(), get_exchange().precisionMode == ccxt.TICK_SIZE))
+    return _SIZING_RULES[sym]
+
+def size_buys(sym, bands, usd):
+    """
+    [(buy_price, sell_price, qty), ...] for the [(buy_price, sell_price), ...]
+    bands that meet the market's minimums with `usd` each, sized in one pass
+    so each buy's net covers a valid sell (see sizing.py).
+    """
+    from sizing import size_bands
+
+    if not bands:
+        return []
+    buy_qty, sell_qty, min_usd = size_bands(sizing_rules(sym), [b for b, _ in bands], [s for _, s in bands], usd)
+    sized = []
+    for (buy_price, sell_price), qty, net, need in zip(bands, buy_qty, sell_qty, min_usd):
+        if qty <= 0:
+            log.warning(f"{sym} 📏 Band buy@{buy_price} skipped: ${usd:.2f}/order is under the market minimum (${need:.2f})")
+            continue
+        sized.append((buy_price, sell_price, float(qty)))
+    return sized
+
+def is_ambiguous(e):
+    """Network-level failures: the order may or may not have reached the exchange."""
+    import ccxt
+
+    return isinstance(e, ccxt.NetworkError)
+
+def _place_limit_orders(sym, side, orders):
+    """
+    Submit [(client_id, qty, price), ...] and return [(client_id, order | exception), ...]
+    in the same order. Uses the exchange's batch endpoint when the market has
+    one, otherwise submits concurrently (the scheduler keeps us in budget).
+    """
+    market = get_markets().get(sym, {})
+    if len(orders) > 1 and get_exchange().has.get("createOrders") and not market.get("spot", True):
+        try:
+            placed = get_exchange().create_orders([
+                {
+                    "symbol": sym, "type": "limit", "side": side,
+                    "amount": qty, "price": price,
+                    "params": {"newClientOrderId": cid},
+                }
+                for cid, qty, price in orders
+            ])
+        except Exception as e:
+            return [(cid, e) for cid, _, _ in orders]
+        import ccxt
+        return [
+            (cid, o if o.get("id") else ccxt.InvalidOrder(json.dumps(o.get("info"))))
+            for (cid, _, _), o in zip(orders, placed)
+        ]
+
+    create = get_exchange().create_limit_buy_order if side == "buy" else get_exchange().create_limit_sell_order
+
+    def place(order):
+        cid, qty, price = order
+        try:
+            return cid, create(sym, qty, price, {"newClientOrderId": cid})
+        except Exception as e:
+            return cid, e
+
+    if len(orders) == 1:
+        return [place(orders[0])]
+    with ThreadPoolExecutor(max_workers=min(len(orders), MAX_CONCURRENT_ORDERS)) as pool:
+        return list(pool.map(place, orders))
+
+def _reserve_buy_bands(sym, bands):
+    """
+    Duplicate-band guard + reservation in one IMMEDIATE transaction: every band
+    that has no active row gets a 'pending' row and a journalled intent with its
+    deterministic client order id, so no other process can seed the same band
+    while orders are in flight and a crash can't leave an untracked order.
+    """
+    reserved = []
+    now = clock.now()
+    get_db().commit()
+    get_db().execute("BEGIN IMMEDIATE")
+    try:
+        for buy_price, sell_price, qty in bands:
+            cur = get_db().execute("""
+                SELECT 1 FROM grid_pairs
+                 WHERE symbol = ? AND buy_price = ? AND status NOT IN ('completed', 'dust')
+                 LIMIT 1
+            """, (sym, buy_price))
+            if cur.fetchone():
+                log.warning(f"{sym} ⛔ CAUGHT ATTEMPTED BUY of already existing active row at buy@{buy_price}")
+                continue
+
+            cur = get_db().execute("""
+                INSERT INTO grid_pairs (symbol, buy_price, buy_amount, sell_price, status)
+                VALUES (?, ?, ?, ?, 'pending')
+            """, (sym, buy_price, qty, sell_price))
+            row_id = cur.lastrowid
+            cid = write_intent(get_db(), sym, "buy", buy_price, qty, buy_price, row_id, now)
+            get_db().execute("UPDATE grid_pairs SET buy_client_order_id = ? WHERE id = ?", (cid, row_id))
+            reserved.append((row_id, cid, buy_price, sell_price, qty))
+        get_db().commit()
+    except Exception:
+        get_db().rollback()
+        raise
+    return reserved
 
 #updated needs test
-def submit_buy_pair(sym, buy_price, sell_price, qty):
-    # ── GUARD: prevent duplicate buys on active bands ──────────────
-    cur = DB.execute("""
-        SELECT 1 FROM grid_pairs
-         WHERE symbol = ? AND buy_price = ? AND status != 'completed'
-         LIMIT 1
-    """, (sym, buy_price))
-    if cur.fetchone():
-        log.warning(f"{sym} ⛔ CAUGHT ATTEMPTED BUY of already existing active row at buy@{buy_price}")
-        return
+def submit_buy_batch(sym, bands):
+    """
+    Place buys for [(buy_price, sell_price, qty), ...] in one go.
+
+    Bands are reserved up front, submitted together, then every accepted order
+    is recorded in a single transaction while rejected ones release their
+    reservation. If recording fails, the placed orders are cancelled; bands
+    whose order may still be live (ambiguous placement, failed cancel, fill)
+    keep their reservation for recover_order_intents(). Returns the accepted
+    orders.
+    """
+    reserved = _reserve_buy_bands(sym, bands)
+    if not reserved:
+        return []
+
+    for _, cid, buy_price, _, qty in reserved:
+        log.info(f"▶️ ATTEMPT BUY {sym}: qty={qty} @ buy@{buy_price} (cid={cid})")
+    results = dict(_place_limit_orders(sym, "buy", [(cid, qty, bp) for _, cid, bp, _, qty in reserved]))
+
+    placed  = [(res, results[res[1]]) for res in reserved if not isinstance(results[res[1]], Exception)]
+    failed  = [(res, results[res[1]]) for res in reserved
+               if isinstance(results[res[1]], Exception) and not is_ambiguous(results[res[1]])]
+    unknown = [(res, results[res[1]]) for res in reserved
+               if isinstance(results[res[1]], Exception) and is_ambiguous(results[res[1]])]
 
-    # ── No active row exists → safe to place buy ──────────────────
-    log.info(f"▶️ ATTEMPT BUY {sym}: qty={qty} @ buy@{buy_price}")
-    o = exchange.create_limit_buy_order(sym, qty, buy_price)
-
-    DB.execute("""
-        INSERT INTO grid_pairs (
-            symbol,
-            buy_order_id,
-            buy_order_submitted,
-            buy_price,
-            buy_amount,
-            buy_cost,
-            buy_raw_json,
-            status,
-            sell_price
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        sym,
-        o["id"],
-        datetime.now(timezone.utc),
-        float(o["price"]),
-        float(o["amount"]),
-        float(o["cost"]),
-        json.dumps(o),
-        'waiting',
-        sell_price
-    ))
-    DB.commit()
+    try:
+        with get_db():
+            now = clock.now()
+            get_db().executemany("""
+                UPDATE grid_pairs
+                   SET buy_order_id = ?,
+                       buy_order_submitted = ?,
+                       buy_price = ?,
+                       buy_amount = ?,
+                       buy_cost = ?,
+                       status = 'waiting'
+                 WHERE id = ?
+            """, [
+                (o["id"], now, float(o["price"]), float(o["amount"]), float(o["cost"] or 0), row_id)
+                for (row_id, *_), o in placed
+            ])
+            save_payloads(get_db(), [(row_id, "buy", o) for (row_id, *_), o in placed], now)
+            get_db().executemany("DELETE FROM grid_pairs WHERE id = ?", [(row_id,) for (row_id, *_), _ in failed])
+            record_many(get_db(), [
+                (row_id, sym, SEEDED, float(o["price"]), float(o["amount"]), o["id"], None)
+                for (row_id, *_), o in placed
+            ] + [
+                (row_id, sym, REJECTED, buy_price, qty, None, str(e)[:200])
+                for (row_id, _, buy_price, _, qty), e in failed
+            ])
+            for (_, cid, *_), o in placed:
+                mark(get_db(), cid, STATE_RECORDED, now, o["id"])
+            for (_, cid, *_), _ in failed:
+                mark(get_db(), cid, STATE_FAILED, now)
+    except sqlite3.Error as e:
+        log.error(f"{sym} ❌ Failed to record {len(placed)} buy(s), cancelling them: {e}")
+        # Only bands known to be off the book are released; the rest keep their
+        # pending row and open intent so recovery can resolve them next run
+        cancelled = []
+        for res, o in placed:
+            try:
+                c = get_exchange().cancel_order(o["id"], sym) or {}
+            except Exception as ce:
+                log.error(f"{sym} ❌ Failed to cancel unrecorded buy {o['id']}, left for recovery: {ce}")
+                continue
+            if float(c.get("filled") or 0) > 0:
+                log.warning(f"{sym} 🟡 Unrecorded buy {o['id']} filled {c['filled']} before the cancel, left for recovery")
+                continue
+            cancelled.append((res, o))
+        with get_db():
+            now = clock.now()
+            get_db().executemany("DELETE FROM grid_pairs WHERE id = ?",
+                                 [(row_id,) for (row_id, *_), _ in cancelled + failed])
+            record_many(get_db(), [
+                (row_id, sym, CANCELLED, buy_price, qty, o["id"], "placed but not recorded")
+                for (row_id, _, buy_price, _, qty), o in cancelled
+            ] + [
+                (row_id, sym, REJECTED, buy_price, qty, None, str(err)[:200])
+                for (row_id, _, buy_price, _, qty), err in failed
+            ])
+            for (_, cid, *_), _ in cancelled + failed:
+                mark(get_db(), cid, STATE_FAILED, now)
+        raise
+
+    for (_, cid, buy_price, _, qty), e in failed:
+        log.error(f"{sym} ❌ BUY REJECTED buy@{buy_price} qty={qty} (cid={cid}): {e}")
+    for (_, cid, buy_price, _, qty), e in unknown:
+        log.warning(f"{sym} ❓ BUY OUTCOME UNKNOWN buy@{buy_price} qty={qty} (cid={cid}), left for recovery: {e}")
+    for (_, _, buy_price, _, qty), o in placed:
+        log.info(
+            f"✅ BUY PLACED {sym}: qty={qty} "
+            f"$~{round(qty * buy_price, 2)} buy@{buy_price} (id={o['id']})"
+        )
+    return [o for _, o in placed]
 
-    log.info(
-        f"✅ BUY PLACED {sym}: qty={qty} "
-        f"$~{round(qty * buy_price, 2)} buy@{buy_price} (id={o['id']})"
-    )
+def submit_buy_pair(sym, buy_price, sell_price, qty):
+    return submit_buy_batch(sym, [(buy_price, sell_price, qty)])
+
+def close_as_dust(sym, r, net):
+    """
+    End a band whose bought `net` can't be sold (under the market minimums):
+    status 'dust' is terminal, so the band is free to be seeded again.
+    """
+    get_db().execute("UPDATE grid_pairs SET status = 'dust' WHERE id = ?", (r["id"],))
+    record(get_db(), r["id"], sym, DUST, r["buy_price"], net, None, "under the market minimum")
+    get_db().commit()
+    log.warning(f"{sym} 🧹 Net amount {net} for buy@{r['buy_price']} is under the market minimum, closed as dust")
 
 #updated needs test
 def submit_sell_pair(sym, r, qty):
+    from sizing import sell_quantity
+
     sell_price = r["sell_price"]
-    log.info(f"▶️ ATTEMPT SELL {sym}: qty={qty} @ sell@{sell_price}")
-    o = exchange.create_limit_sell_order(sym, qty, sell_price)
+    # Whole lots only: the exchange would truncate anything finer anyway
+    net, qty = qty, sell_quantity(sizing_rules(sym), qty, sell_price)
+    if not qty:
+        close_as_dust(sym, r, net)
+        return None
+
+    # Journal the intent before the order exists anywhere
+    now = clock.now()
+    cid = write_intent(get_db(), sym, "sell", sell_price, qty, sell_price, r["id"], now)
+    get_db().execute("UPDATE grid_pairs SET sell_client_order_id = ? WHERE id = ?", (cid, r["id"]))
+    get_db().commit()
+
+    log.info(f"▶️ ATTEMPT SELL {sym}: qty={qty} @ sell@{sell_price} (cid={cid})")
+    try:
+        o = get_exchange().create_limit_sell_order(sym, qty, sell_price, {"newClientOrderId": cid})
+    except Exception as e:
+        if not is_ambiguous(e):
+            mark(get_db(), cid, STATE_FAILED, clock.now())
+            get_db().commit()
+        raise
 
-    DB.execute("""
+    mark(get_db(), cid, STATE_RECORDED, clock.now(), o["id"])
+    get_db().execute("""
         UPDATE grid_pairs
            SET sell_order_id = ?,
                sell_order_submitted = ?,
@@ -171,161 +433,297 @@ def submit_sell_pair(sym, r, qty):
          WHERE buy_order_id = ?
     """, (
         o["id"],
-        datetime.now(timezone.utc),
+        clock.now(),
         float(o["price"]),
         r["buy_order_id"]
     ))
-    DB.commit()
+    record(get_db(), r["id"], sym, SELL_PLACED, float(o["price"]), qty, o["id"])
+    get_db().commit()
 
     log.info(
         f"✅ SELL PLACED {sym}: qty={qty} "
         f"$~{round(qty * sell_price, 2)} sell@{sell_price} (id={o['id']})"
     )
 
+def _fee_rates(currencies, quote):
+    """Quote price of every fee currency that isn't base/quote (e.g. BNB), cached per run."""
+    rates = {}
+    for ccy in currencies:
+        key = f"{ccy}/{quote}"
+        if key not in _FEE_RATES:
+            try:
+                _FEE_RATES[key] = get_price(key) if key in get_markets() else float("nan")
+            except Exception as e:
+                log.warning(f"⚠️ No {key} rate for fee conversion: {e}")
+                _FEE_RATES[key] = float("nan")
+        rates[ccy] = _FEE_RATES[key]
+    return rates
+
+def fetch_fill_summaries(sym, filled, since=None):
+    """
+    One fetch_my_trades for the symbol, aggregated per order. `filled` maps
+    each order id to the amount the exchange reports filled; an order whose
+    trades in that page add up to less (some fell before `since` or past the
+    page limit) gets a targeted per-order lookup instead.
+    """
+    if not filled:
+        return {}
+    market = get_markets()[sym]
+    base, quote = market["base"], market["quote"]
+    trades = get_exchange().fetch_my_trades(symbol=sym, since=since)
+    seen = {}
+    for t in trades:
+        seen[t.get("order")] = seen.get(t.get("order"), 0.0) + float(t.get("amount") or 0)
+    short = [oid for oid, amount in filled.items()
+             if oid not in seen or seen[oid] < float(amount or 0) * (1 - 1e-9)]
+    for oid in short:
+        trades = [t for t in trades if t.get("order") != oid]
+        trades += get_exchange().fetch_my_trades(symbol=sym, params={"orderId": oid})
+
+    from fills import aggregate_trades, fee_currencies, order_summary
+
+    rates = _fee_rates(fee_currencies(trades) - {base, quote}, quote)
+    agg = aggregate_trades(trades, base, quote, rates)
+    return {oid: order_summary(agg, oid) for oid in filled}
+
+def _since_ms(stamps):
+    """fetch_my_trades `since` covering orders submitted at `stamps` (a minute of slack)."""
+    stamps = [ts for ts in stamps if ts]
+    if not stamps:
+        return None
+    earliest = min(datetime.fromisoformat(str(ts)) for ts in stamps)
+    return int(earliest.timestamp() * 1000) - 60_000
+
+def _fetch_order_or_none(order_id, sym):
+    """One bad order lookup shouldn't stop the rest of the symbol's reconciliation."""
+    try:
+        return get_exchange().fetch_order(order_id, sym)
+    except Exception as e:
+        log.error(f"{sym} ⚠️ fetch_order {order_id} failed: {e}")
+        return None
+
 #updated needs test
+@profiled("phase:check_fills")
 def check_fills_for_symbol(sym, cfg):
-    import json
+    """
+    Reconcile active rows with the exchange.
+
+      • open buys with a partial fill → 'partially_filled' (never cancelled by set_band_close)
+      • buys off the book → aggregate all their trades, normalize fees, sell the net qty;
+        cancelled with a partial fill → sell what was filled; cancelled empty → drop the row
+      • sells off the book → aggregate and complete; cancelled → back to 'ready_to_sell'
+        for whatever is left
+
+    *_fee_cost is stored in the quote currency (BNB/base fees converted);
+    *_fees_data keeps the raw per-currency totals.
+    """
+    quote = get_markets()[sym]["quote"]
+
     # --- log current open orders ---
-    open_orders = exchange.fetch_open_orders(sym)
+    open_orders = get_exchange().fetch_open_orders(sym)
     if open_orders:
         items = [
-            f"{o['side']}@{o['price']} qty={o['amount']} id={o['id']}"
+            f"{o['side']}@{o['price']} qty={o['amount']} filled={o.get('filled') or 0} id={o['id']}"
             for o in open_orders
         ]
         log.info(f"{sym} 🔍 OPEN ORDERS: {'; '.join(items)}")
     else:
         log.info(f"{sym} 🔍 OPEN ORDERS: none")
 
-    open_ids = {o["id"] for o in open_orders}
-    cur = DB.execute("""
-        SELECT id, * FROM grid_pairs
-         WHERE symbol=? AND status IN ('waiting','holding')
+    open_by_id = {o["id"]: o for o in open_orders}
+    rows = fetch_rows("""
+        SELECT id, status, buy_order_id, buy_order_submitted, buy_price, buy_amount,
+               buy_filled_amount, buy_net_amount, sell_order_id, sell_order_submitted, sell_price
+          FROM grid_pairs
+         WHERE symbol=? AND status IN ('waiting','partially_filled','holding')
     """, (sym,))
-    rows = cur.fetchall()
-    cols = [c[0] for c in cur.description]
 
-    for row in rows:
-        r = dict(zip(cols, row))
+    # Partial progress of buys still on the book
+    for r in rows:
+        if r["status"] == "holding" or r["buy_order_id"] not in open_by_id:
+            continue
+        filled = float(open_by_id[r["buy_order_id"]].get("filled") or 0)
+        if filled > 0 and filled != (r["buy_filled_amount"] or 0):
+            get_db().execute("""
+                UPDATE grid_pairs
+                   SET buy_filled_amount=?, status='partially_filled'
+                 WHERE id=?
+            """, (filled, r["id"]))
+            record(get_db(), r["id"], sym, BUY_PARTIAL, r["buy_price"], filled, r["buy_order_id"])
+            log.info(f"🟡 {sym} BUY PARTIALLY FILLED: {filled}/{r['buy_amount']} buy@{r['buy_price']}")
+    get_db().commit()
+
+    buys  = [r for r in rows if r["status"] != "holding" and r["buy_order_id"] not in open_by_id]
+    sells = [r for r in rows if r["status"] == "holding" and r["sell_order_id"] not in open_by_id]
+    if not buys and not sells:
+        return
 
-        # BUY filled?
-        if r["status"] == "waiting" and r["buy_order_id"] not in open_ids:
-            order = exchange.fetch_order(r["buy_order_id"], sym)
-            if not order:
-                log.error(f"{sym} ⚠️ missing buy order {r['buy_order_id']}")
-                continue
+    orders = {
+        oid: _fetch_order_or_none(oid, sym)
+        for oid in [r["buy_order_id"] for r in buys] + [r["sell_order_id"] for r in sells]
+    }
+    # Trades are only needed for orders that actually filled something, and
+    # only from the oldest of those orders' own submission on: a sell's buy
+    # can be weeks older, and the page would then hold only stale trades
+    filled_by_order = {oid: float(o["filled"]) for oid, o in orders.items() if o and float(o.get("filled") or 0) > 0}
+    summaries = fetch_fill_summaries(sym, filled_by_order, since=_since_ms(
+        [r["buy_order_submitted"] for r in buys if r["buy_order_id"] in filled_by_order]
+        + [r["sell_order_submitted"] for r in sells if r["sell_order_id"] in filled_by_order]
+    ))
 
-            filled = float(order["filled"])
-            cost = order["cost"]
+    for r in buys:
+        order = orders[r["buy_order_id"]]
+        if not order:
+            log.error(f"{sym} ⚠️ missing buy order {r['buy_order_id']}")
+            continue
 
-            # Pull trade info
-            trades = exchange.fetch_my_trades(symbol=sym)
-            trades = [t for t in trades if t.get("order") == r["buy_order_id"]]
-            trade = trades[0] if trades else {}
-            fee = trade.get("fee", {})
-            fee_cost = fee.get("cost", 0.0)
-            fee_currency = fee.get("currency", "")
-            fees_list = trade.get("fees", [])
-            fees_count = len(fees_list)
-            fees_json = json.dumps(fees_list)
+        status = order.get("status")
+        if status == "open":
+            continue
+        filled = float(order.get("filled") or 0)
+        if filled <= 0:
+            if status in ("canceled", "expired", "rejected"):
+                record(get_db(), r["id"], sym, CANCELLED, r["buy_price"], 0.0, r["buy_order_id"], f"exchange {status}")
+                get_db().execute("DELETE FROM grid_pairs WHERE id=?", (r["id"],))
+                get_db().commit()
+                log.info(f"{sym} ❎ Buy {r['buy_order_id']} @ {r['buy_price']} {status} with no fill, row removed")
+            continue
 
-            net = filled - fee_cost
+        s = summaries.get(r["buy_order_id"])
+        if not s:
+            log.warning(f"{sym} ⏳ Buy {r['buy_order_id']} filled but trades not visible yet, retrying next run")
+            continue
 
-            DB.execute("""
-                UPDATE grid_pairs
-                   SET buy_order_filled=?,
-                       buy_cost=?,
-                       buy_fee_cost=?,
-                       buy_fee_currency=?,
-                       buy_fees=?,
-                       buy_fees_data=?,
-                       status='ready_to_sell'
-                 WHERE id=?
-            """, (
-                datetime.now(timezone.utc),
-                cost,
-                fee_cost,
-                fee_currency,
-                fees_count,
-                fees_json,
-                r["id"]
-            ))
-            DB.commit()
+        net = s["net_base"]
+        get_db().execute("""
+            UPDATE grid_pairs
+               SET buy_order_filled=?,
+                   buy_cost=?,
+                   buy_filled_amount=?,
+                   buy_net_amount=?,
+                   buy_fee_cost=?,
+                   buy_fee_currency=?,
+                   buy_fees=?,
+                   buy_fees_data=?,
+                   status='ready_to_sell'
+             WHERE id=?
+        """, (
+            clock.now(),
+            s["cost"],
+            s["filled"],
+            net,
+            s["fee_quote_equiv"],
+            quote,
+            int(s["trades"]),
+            s["fees_data"],
+            r["id"]
+        ))
+        record(get_db(), r["id"], sym, BUY_FILLED, s["price"], net, r["buy_order_id"],
+               f"order {status}" if status != "closed" else None)
+        get_db().commit()
+
+        partial = " (PARTIAL, order " + status + ")" if status != "closed" else ""
+        log.info(
+            f"🟢 {sym} BUY FILLED{partial}: qty={s['filled']} trades={int(s['trades'])} "
+            f"fee={s['fee_quote_equiv']:.8f} {quote} net={net:.8f} buy@{s['price']:.8f}"
+        )
+        submit_sell_pair(sym, r, net)
 
-            log.info(
-                f"🟢 {sym} BUY FILLED: qty={filled} "
-               #NEED UPDATE f"fee={fee_cost} {fee_currency} net={net:.8f} buy@{price_exec:.8f}"
-            )
-            submit_sell_pair(sym, r, net)
+    for r in sells:
+        order = orders[r["sell_order_id"]]
+        if not order:
+            log.error(f"{sym} ⚠️ missing sell order {r['sell_order_id']}")
+            continue
 
-        # SELL filled?
-        elif r["status"] == "holding" and r["sell_order_id"] not in open_ids:
-            order = exchange.fetch_order(r["sell_order_id"], sym)
-            if not order:
-                log.error(f"{sym} ⚠️ missing sell order {r['sell_order_id']}")
-                continue
+        status = order.get("status")
+        if status == "open":
+            continue
+        filled = float(order.get("filled") or 0)
+        s = summaries.get(r["sell_order_id"])
+        if filled > 0 and not s:
+            log.warning(f"{sym} ⏳ Sell {r['sell_order_id']} filled but trades not visible yet, retrying next run")
+            continue
+        s = s or {"filled": 0.0, "cost": 0.0, "price": 0.0, "fee_quote_equiv": 0.0, "trades": 0, "fees_data": "{}"}
 
-            filled = float(order["filled"])
-            cost = order["cost"]
-
-            # Pull trade info
-            trades = exchange.fetch_my_trades(symbol=sym)
-            trades = [t for t in trades if t.get("order") == r["sell_order_id"]]
-            trade = trades[0] if trades else {}
-            fee = trade.get("fee", {})
-            fee_cost = fee.get("cost", 0.0)
-            fee_currency = fee.get("currency", "")
-            fees_list = trade.get("fees", [])
-            fees_count = len(fees_list)
-            fees_json = json.dumps(fees_list)
-
-            DB.execute("""
+        if status == "closed":
+            get_db().execute("""
                 UPDATE grid_pairs
                    SET sell_order_filled=?,
-                       sell_cost=?,
-                       sell_fee_cost=?,
+                       sell_amount=COALESCE(sell_amount, 0) + ?,
+                       sell_cost=COALESCE(sell_cost, 0) + ?,
+                       sell_fee_cost=COALESCE(sell_fee_cost, 0) + ?,
                        sell_fee_currency=?,
-                       sell_fees=?,
+                       sell_fees=COALESCE(sell_fees, 0) + ?,
                        sell_fees_data=?,
                        status='completed'
                  WHERE id=?
             """, (
-                datetime.now(timezone.utc),
-                cost,
-                fee_cost,
-                fee_currency,
-                fees_count,
-                fees_json,
+                clock.now(),
+                s["filled"],
+                s["cost"],
+                s["fee_quote_equiv"],
+                quote,
+                int(s["trades"]),
+                s["fees_data"],
                 r["id"]
             ))
-            DB.commit()
+            record(get_db(), r["id"], sym, COMPLETED, s["price"], s["filled"], r["sell_order_id"])
+            get_db().commit()
 
             log.info(
-                f"🔴 {sym} SELL FILLED: qty={filled} "
-                #need update f"fee={fee_cost} {fee_currency} net={net:.8f} sell@{price_exec:.8f}"
+                f"🔴 {sym} SELL FILLED: qty={s['filled']} trades={int(s['trades'])} "
+                f"fee={s['fee_quote_equiv']:.8f} {quote} sell@{s['price']:.8f}"
             )
             log.info(f"🏁 {sym} PAIR DONE: buy@{r['buy_price']} → sell@{r['sell_price']}")
+        else:
+            # Sell left the book unfilled or part-filled: book what sold, re-sell the rest
+            remaining = (r["buy_net_amount"] or r["buy_amount"]) - s["filled"]
+            get_db().execute("""
+                UPDATE grid_pairs
+                   SET sell_order_id=NULL,
+                       sell_amount=COALESCE(sell_amount, 0) + ?,
+                       sell_cost=COALESCE(sell_cost, 0) + ?,
+                       sell_fee_cost=COALESCE(sell_fee_cost, 0) + ?,
+                       sell_fee_currency=?,
+                       sell_fees=COALESCE(sell_fees, 0) + ?,
+                       buy_net_amount=?,
+                       status='ready_to_sell'
+                 WHERE id=?
+            """, (
+                s["filled"],
+                s["cost"],
+                s["fee_quote_equiv"],
+                quote,
+                int(s["trades"]),
+                remaining,
+                r["id"]
+            ))
+            record(get_db(), r["id"], sym, SELL_REOPENED, r["sell_price"], remaining, r["sell_order_id"], f"sell {status}")
+            get_db().commit()
+            log.warning(
+                f"{sym} ⚠️ Sell {r['sell_order_id']} {status} after {s['filled']} filled; "
+                f"{remaining:.8f} left to sell"
+            )
 
 #updated needs test
+@profiled("phase:seed_grid")
 def seed_grid_for_symbol(sym, cfg):
-    import time
-
     # 1) Get current price
-    price = get_price(sym)
+    price = cycle_price(sym)
     log.info(f"{sym} ⇒ Current price: {price:.8f}")
 
     usd       = cfg["usd_per_order"]
-    bands     = 1
-    all_pairs = load_price_grid("grids/" + cfg["grid_file"])
+    bands     = cfg.get("bands", 1)
+    all_pairs = grid_for(sym, cfg)
 
     # 2) Eligible buy/sell pairs below current price
-    eligible = [(b, s) for b, s in all_pairs if b < price]
-    eligible.sort(key=lambda x: x[0], reverse=True)
+    eligible = all_pairs.below(price)
 
     # 3) Count existing active bands under current price
-    cur = DB.execute("""
+    cur = get_db().execute("""
         SELECT buy_price FROM grid_pairs
          WHERE symbol=?
-           AND status IN ('waiting','ready_to_sell','holding')
+           AND status IN ('pending','waiting','partially_filled','ready_to_sell','holding')
     """, (sym,))
     all_active = {r[0] for r in cur.fetchall()}
     active_under = {bp for bp in all_active if bp < price}
@@ -338,27 +736,23 @@ def seed_grid_for_symbol(sym, cfg):
         log.info(f"{sym} ➡️ No new buys needed.")
         return
 
-    # 5) Submit new buys for next needed bands
-    seeded = 0
+    # 5) Pick the next needed bands, size them together and submit them as one batch
+    candidates = []
     for buy_price, sell_price in eligible:
-        if seeded >= needed:
+        if len(candidates) >= needed:
             break
         if buy_price in active_under:
             continue
+        candidates.append((buy_price, sell_price))
 
-        # Calculate qty with precision handling
-        raw_qty = usd / buy_price
-        qty = float(exchange.amount_to_precision(sym, raw_qty))
-
+    batch = size_buys(sym, candidates, usd)
+    for buy_price, sell_price, qty in batch:
         log.info(
             f"{sym} Seeding band: qty={qty:.8f} "
             f"@ buy@{buy_price:.8f} / sell@{sell_price:.8f}"
         )
 
-        # Submit order (submit_buy_pair must conform to new schema expectations)
-        submit_buy_pair(sym, buy_price, sell_price, qty)
-        seeded += 1
-        time.sleep(1)
+    seeded = len(submit_buy_batch(sym, batch)) if batch else 0
 
     log.info(
         f"{sym} ➡️ Seeded {seeded} new buy(s); "
@@ -366,193 +760,584 @@ def seed_grid_for_symbol(sym, cfg):
     )
 
 #updated needs test
+@profiled("phase:retry_sells")
 def retry_failed_sells_for_symbol(sym):
-    import json
+    from sizing import sell_quantity
 
     log.info(f"{sym} 🔁 Checking for stranded 'ready_to_sell' rows...")
+    rows = fetch_rows("""
+        SELECT id, buy_order_id, buy_price, buy_amount, buy_net_amount, sell_order_id, sell_price
+          FROM grid_pairs
+         WHERE symbol=? AND status='ready_to_sell'
+    """, (sym,))
+    if not rows:
+        return
+
     try:
-        open_orders = exchange.fetch_open_orders(sym)
+        open_orders = get_exchange().fetch_open_orders(sym)
         open_sell_ids = {o["id"] for o in open_orders if o["side"] == "sell"}
     except Exception as e:
         log.error(f"{sym} ⚠️ Failed to fetch open orders for retry: {e}")
         return
 
-    cur = DB.execute("""
-        SELECT id, * FROM grid_pairs
-         WHERE symbol=? AND status='ready_to_sell'
-    """, (sym,))
-    rows = cur.fetchall()
-    cols = [c[0] for c in cur.description]
+    current_price = None
 
-    for row in rows:
-        r = dict(zip(cols, row))
+    for r in rows:
         sell_price = r["sell_price"]
-        existing_sell_id = r.get("sell_order_id")
+        existing_sell_id = r["sell_order_id"]
+        # Net of base-currency fees; legacy rows only know the order amount
+        net = r["buy_net_amount"] if r["buy_net_amount"] is not None else r["buy_amount"]
+        qty = sell_quantity(sizing_rules(sym), net, sell_price)
+        if not qty:
+            close_as_dust(sym, r, net)
+            continue
 
         # Already active?
         if existing_sell_id and existing_sell_id in open_sell_ids:
             log.info(f"{sym} ✅ Existing sell order still active for buy@{r['buy_price']}")
             continue
 
-        # Get live price
-        try:
-            current_price = get_price(sym)
-            log.info(f"{sym} 🔎 Price check: now {current_price:.8f}, target sell@{sell_price:.8f}")
-        except Exception as e:
-            log.error(f"{sym} ⚠️ Failed to fetch price for retry: {e}")
+        # A sell may be in flight from a crashed run; recovery resolves it first
+        if has_open_intent(get_db(), r["id"], "sell"):
+            log.info(f"{sym} 🧾 Sell for buy@{r['buy_price']} has an unresolved intent, skipping")
             continue
 
+        # Get live price once per symbol (at sell priority: these rows are already bought)
+        if current_price is None:
+            try:
+                from rate_limiter import PRIORITY_SELL
+                with get_exchange().priority(PRIORITY_SELL):
+                    current_price = get_price(sym)
+            except Exception as e:
+                log.error(f"{sym} ⚠️ Failed to fetch price for retry, leaving {len(rows)} row(s) for next run: {e}")
+                return
+        log.info(f"{sym} 🔎 Price check: now {current_price:.8f}, target sell@{sell_price:.8f}")
+
         # If price already above sell_price, execute market sell
         if current_price >= sell_price:
             log.info(f"{sym} ⏫ Price above target, selling immediately at market price!")
+            cid = write_intent(get_db(), sym, "sell", sell_price, qty, None, r["id"], clock.now())
+            get_db().execute("UPDATE grid_pairs SET sell_client_order_id = ? WHERE id = ?", (cid, r["id"]))
+            get_db().commit()
             try:
-                o = exchange.create_market_sell_order(sym, r["buy_amount"])  # temporary qty guess
-
-                # Fetch trade by order ID
-                trades = exchange.fetch_my_trades(symbol=sym, params={"order": o["id"]})
-                trade = trades[0] if trades else {}
-                amount = trade.get("amount", 0.0)
-
-                fee = trade.get("fee", {}) or {}
-                fee_cost = fee.get("cost", 0.0)
-                fee_currency = fee.get("currency", "")
-                fees = trade.get("fees", [])
-                fee_count = len(fees)
-                fees_json = json.dumps(fees)
-                cost = trade.get("cost", current_price * amount)
-
-                DB.execute("""
+                o = get_exchange().create_market_sell_order(sym, qty, {"newClientOrderId": cid})
+
+                # Aggregate every trade of the market order
+                s = fetch_fill_summaries(sym, {o["id"]: o.get("filled")})[o["id"]] or {}
+                amount = s.get("filled", 0.0)
+                price_exec = s.get("price") or current_price
+
+                get_db().execute("""
                     UPDATE grid_pairs
                        SET sell_order_id=?,
                            sell_order_submitted=?,
                            sell_order_filled=?,
-                           sell_amount=?,
+                           sell_amount=COALESCE(sell_amount, 0) + ?,
                            sell_price=?,
-                           sell_cost=?,
-                           sell_fee_cost=?,
+                           sell_cost=COALESCE(sell_cost, 0) + ?,
+                           sell_fee_cost=COALESCE(sell_fee_cost, 0) + ?,
                            sell_fee_currency=?,
-                           sell_fees=?,
+                           sell_fees=COALESCE(sell_fees, 0) + ?,
                            sell_fees_data=?,
-                           sell_raw_json=?,
                            status='completed'
                      WHERE id=?
                 """, (
                     o["id"],
-                    datetime.now(timezone.utc),
-                    datetime.now(timezone.utc),
+                    clock.now(),
+                    clock.now(),
                     amount,
-                    current_price,
-                    cost,
-                    fee_cost,
-                    fee_currency,
-                    fee_count,
-                    fees_json,
-                    json.dumps(o),
+                    price_exec,
+                    s.get("cost", current_price * amount),
+                    s.get("fee_quote_equiv", 0.0),
+                    get_markets()[sym]["quote"],
+                    int(s.get("trades", 0)),
+                    s.get("fees_data", "{}"),
                     r["id"]
                 ))
-                DB.commit()
-                log.info(f"🏁 {sym} MARKET SELL COMPLETE: qty={amount} sell@{current_price:.8f}")
+                save_payloads(get_db(), [(r["id"], "sell", o)], clock.now())
+                record(get_db(), r["id"], sym, COMPLETED, price_exec, amount, o["id"], "market sell")
+                mark(get_db(), cid, STATE_RECORDED, clock.now(), o["id"])
+                get_db().commit()
+                log.info(f"🏁 {sym} MARKET SELL COMPLETE: qty={amount} sell@{price_exec:.8f}")
             except Exception as e:
+                if not is_ambiguous(e):
+                    mark(get_db(), cid, STATE_FAILED, clock.now())
+                    get_db().commit()
                 log.error(f"{sym} ❌ Market sell failed: {e}")
         else:
             # Re-attempt limit sell
             log.warning(f"{sym} 🛑 Sell order missing, retrying limit sell...")
             try:
-                submit_sell_pair(sym, r, r["buy_amount"])
+                submit_sell_pair(sym, r, qty)
             except Exception as e:
                 log.error(f"{sym} ❌ Retry limit sell failed: {e}")
 
 #updated needs test
+def band_floor(sym, cfg, price):
+    """Buy price of the lowest band `cfg` keeps an order on under `price`; None if no band is under it."""
+    valid_bands = grid_for(sym, cfg).below(price)
+    if not valid_bands:
+        return None
+    return valid_bands[min(cfg.get("bands", 1), len(valid_bands)) - 1][0]
+
+def stale_buy_rows(sym, floor_buy):
+    """'waiting' rows below `floor_buy`: the buys set_band_close cancels."""
+    return fetch_rows("""
+        SELECT id, buy_order_id, buy_price FROM grid_pairs
+         WHERE symbol = ? AND status = 'waiting' AND buy_price < ?
+    """, (sym, floor_buy))
+
+def cancels_stale_bands(sym, cfg, last):
+    """Whether set_band_close would cancel rows at price `last` (assumed so when there is none)."""
+    if not last:
+        return True
+    floor_buy = band_floor(sym, cfg, float(last))
+    return floor_buy is not None and bool(stale_buy_rows(sym, floor_buy))
+
+@profiled("phase:set_band_close")
 def set_band_close(sym, cfg):
+    """
+    Cancel buys below the allocated bands and keep the closest band bought.
+    Returns False if the pass failed or a stale buy couldn't be cancelled,
+    so the symbol isn't marked maintained and gets another pass.
+    """
     try:
-        price = get_price(sym)
+        price = cycle_price(sym)
         log.info(f"{sym} ⬆️ set_band_close(): current price: {price:.8f}")
 
         # Load all configured grid bands
-        all_pairs = load_price_grid("grids/" + cfg["grid_file"])
-        valid_bands = [(b, s) for b, s in all_pairs if b < price]
+        all_pairs = grid_for(sym, cfg)
+        valid_bands = all_pairs.below(price)
         if not valid_bands:
             log.info(f"{sym} ❌ No valid buy bands under current price.")
-            return
+            return True
 
         next_buy, next_sell = valid_bands[0]
         log.info(f"{sym} 🎯 Closest eligible band: buy@{next_buy} → sell@{next_sell}")
 
-        # Fetch all 'waiting' orders for this symbol
-        cur = DB.execute("""
-            SELECT id, buy_order_id, buy_price FROM grid_pairs
-             WHERE symbol = ? AND status = 'waiting'
-        """, (sym,))
-        rows = cur.fetchall()
-
-        # Cancel all stale 'waiting' orders BELOW the closest band
-        stale_orders = [row for row in rows if row[2] < next_buy]
-
-        for row in stale_orders:
-            row_id, order_id, buy_price = row
+        # Cancel all stale 'waiting' orders BELOW the allocated bands. A row is
+        # only dropped once its cancel went through with nothing filled; the
+        # rest (already filled, part-filled, unreachable) go to the fill check
+        floor_buy = band_floor(sym, cfg, price)
+        unresolved = failed = 0
+        for r in stale_buy_rows(sym, floor_buy):
+            row_id, order_id, buy_price = r["id"], r["buy_order_id"], r["buy_price"]
             try:
-                exchange.cancel_order(order_id, sym)
-                log.info(f"{sym} ❎ Canceled stale buy order {order_id} @ {buy_price}")
+                cancelled = get_exchange().cancel_order(order_id, sym)
             except Exception as e:
-                log.warning(f"{sym} ⚠️ Failed to cancel {order_id}: {e}")
-            DB.execute("DELETE FROM grid_pairs WHERE id = ?", (row_id,))
-        DB.commit()
+                log.warning(f"{sym} ⚠️ Failed to cancel {order_id}, leaving it to the fill check: {e}")
+                unresolved += 1
+                failed += 1
+                continue
+            filled = float((cancelled or {}).get("filled") or 0)
+            if filled > 0:
+                log.info(f"{sym} 🟡 Stale buy {order_id} @ {buy_price} filled {filled} before the cancel")
+                unresolved += 1
+                continue
+            log.info(f"{sym} ❎ Canceled stale buy order {order_id} @ {buy_price}")
+            record(get_db(), row_id, sym, CANCELLED, buy_price, 0.0, order_id, f"below band floor {floor_buy}")
+            get_db().execute("DELETE FROM grid_pairs WHERE id = ?", (row_id,))
+            get_db().commit()
+        if unresolved:
+            check_fills_for_symbol(sym, cfg)
 
         # 🔍 Check if next_buy already exists with an INCOMPLETE status
-        cur = DB.execute("""
+        cur = get_db().execute("""
             SELECT COUNT(*) FROM grid_pairs
-             WHERE symbol = ? AND buy_price = ? AND status != 'completed'
+             WHERE symbol = ? AND buy_price = ? AND status NOT IN ('completed', 'dust')
         """, (sym, next_buy))
         count = cur.fetchone()[0]
 
         if count > 0:
             log.info(f"{sym} 🚫 Band {next_buy} already has an active or pending buy. Skipping new order.")
-            return
+            return not failed
 
         # ✅ Safe to place a new buy
-        raw_qty = cfg["usd_per_order"] / next_buy
-        qty     = float(exchange.amount_to_precision(sym, raw_qty))
+        sized = size_buys(sym, [(next_buy, next_sell)], cfg["usd_per_order"])
+        if not sized:
+            return not failed
+        qty = sized[0][2]
         log.info(
             f"{sym} ➕ Placing replacement buy: qty={qty:.8f} "
             f"@ buy@{next_buy:.8f} / sell@{next_sell:.8f}"
         )
         submit_buy_pair(sym, next_buy, next_sell, qty)
+        return not failed
 
     except Exception as e:
         log.error(f"{sym} ❌ set_band_close failed: {e}")
+        return False
+
+def _sell_level(sym, buy_price):
+    """Sell level of the band bought at `buy_price`, or None if that isn't one of the symbol's grid levels."""
+    cfg = get_config().get(sym)
+    if cfg is None:
+        return None
+    levels = grid_for(sym, cfg).levels
+    k = grid_for(sym, cfg).band_index(buy_price)
+    if k + 1 < len(levels) and abs(levels[k] - buy_price) <= 1e-9 * buy_price:
+        return float(levels[k + 1])
+    return None
+
+def _settle_orphaned_order(sym, cid, side, band, o):
+    """
+    An order that went live while its row was deleted or moved on (batch
+    cleanup, remove_low.py, a second sell). A buy gets its row back when the
+    band is free and its sell level is known; anything else is cancelled. If
+    that can't be done cleanly the intent stays open for the next run.
+    """
+    now = clock.now()
+    if side == "buy":
+        sell_price = _sell_level(sym, band)
+        busy = get_db().execute("""
+            SELECT 1 FROM grid_pairs
+             WHERE symbol = ? AND buy_price = ? AND status NOT IN ('completed', 'dust')
+             LIMIT 1
+        """, (sym, band)).fetchone()
+        if sell_price is not None and not busy:
+            with get_db():
+                cur = get_db().execute("""
+                    INSERT INTO grid_pairs (symbol, buy_order_id, buy_client_order_id, buy_order_submitted,
+                                            buy_price, buy_amount, buy_cost, sell_price, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'waiting')
+                """, (sym, o["id"], cid, now, float(o["price"]), float(o["amount"]), float(o["cost"] or 0), sell_price))
+                row_id = cur.lastrowid
+                save_payloads(get_db(), [(row_id, "buy", o)], now)
+                record(get_db(), row_id, sym, SEEDED, float(o["price"]), float(o["amount"]), o["id"],
+                       "recovered, row re-created")
+                mark(get_db(), cid, STATE_RECORDED, now, o["id"])
+            log.warning(f"{sym} 🧾 Recovered buy {o['id']} @ {band} had lost its row, re-created as {row_id} (cid={cid})")
+            return
+
+    if o.get("status") == "open":
+        try:
+            o = get_exchange().cancel_order(o["id"], sym) or o
+        except Exception as e:
+            log.error(f"{sym} ❌ Could not cancel {side} {o['id']} @ {band} that has no row, will retry next run: {e}")
+            return
+    filled = float(o.get("filled") or 0)
+    if filled > 0:
+        log.error(f"{sym} ❌ {side.capitalize()} {o['id']} @ {band} filled {filled} but has no row to record it "
+                  f"(cid={cid}); intent left open")
+        return
+    with get_db():
+        mark(get_db(), cid, STATE_FAILED, now)
+    log.warning(f"{sym} 🧾 {side.capitalize()} {o['id']} @ {band} had no row to record it, cancelled (cid={cid})")
+
+@profiled("phase:recover_intents")
+def recover_order_intents():
+    """
+    Resolve every order that was journalled but never confirmed (crash between
+    placing it and recording it) with one lookup by client order id each.
+    """
+    import ccxt
+
+    pending = open_intents(get_db())
+    if not pending:
+        return
+    log.info(f"🧾 Recovering {len(pending)} unresolved order intent(s)...")
+
+    for cid, sym, side, band, pair_id, amount, price in pending:
+        try:
+            o = get_exchange().fetch_order(None, sym, {"origClientOrderId": cid})
+        except ccxt.OrderNotFound:
+            o = None
+        except Exception as e:
+            log.error(f"{sym} ⚠️ Could not resolve intent {cid}, will retry next run: {e}")
+            continue
+
+        now = clock.now()
+        orphaned = False
+        with get_db():
+            if o is None or (o.get("status") in ("canceled", "expired", "rejected") and not o.get("filled")):
+                mark(get_db(), cid, STATE_FAILED, now)
+                if side == "buy":
+                    cur = get_db().execute("DELETE FROM grid_pairs WHERE id = ? AND status = 'pending'", (pair_id,))
+                    if cur.rowcount:
+                        record(get_db(), pair_id, sym, REJECTED, band, amount, None, "intent never went live")
+                log.info(f"{sym} 🧾 Intent {cid} ({side}@{band}) never went live, released")
+            elif side == "buy":
+                cur = get_db().execute("""
+                    UPDATE grid_pairs
+                       SET buy_order_id = ?,
+                           buy_order_submitted = ?,
+                           buy_price = ?,
+                           buy_amount = ?,
+                           buy_cost = ?,
+                           status = 'waiting'
+                     WHERE id = ? AND status = 'pending'
+                """, (o["id"], now, float(o["price"]), float(o["amount"]), float(o["cost"] or 0), pair_id))
+                if cur.rowcount:
+                    save_payloads(get_db(), [(pair_id, "buy", o)], now)
+                    record(get_db(), pair_id, sym, SEEDED, float(o["price"]), float(o["amount"]), o["id"], "recovered")
+                    mark(get_db(), cid, STATE_RECORDED, now, o["id"])
+                    log.info(f"{sym} 🧾 Recovered buy {o['id']} @ {band} (cid={cid})")
+                orphaned = not cur.rowcount
+            else:
+                cur = get_db().execute("""
+                    UPDATE grid_pairs
+                       SET sell_order_id = ?,
+                           sell_order_submitted = ?,
+                           status = 'holding'
+                     WHERE id = ? AND status = 'ready_to_sell'
+                """, (o["id"], now, pair_id))
+                if cur.rowcount:
+                    record(get_db(), pair_id, sym, SELL_PLACED, band, amount, o["id"], "recovered")
+                    mark(get_db(), cid, STATE_RECORDED, now, o["id"])
+                    log.info(f"{sym} 🧾 Recovered sell {o['id']} @ {band} (cid={cid})")
+                orphaned = not cur.rowcount
+        # Exchange calls stay outside the transaction
+        if orphaned:
+            _settle_orphaned_order(sym, cid, side, band, o)
 
 #chillin
-def update_config_with_dynamic_usdt(CONFIG, exchange, percent=0.04):
+def update_config_with_dynamic_usdt(CONFIG, exchange, percent=0.04, usdt_balance=None):
     try:
-        balance_info = exchange.fetch_balance()
-        usdt_balance = balance_info["USDT"]["free"]
-        dynamic_usd = round(usdt_balance * percent, 4)
-        log.info(f"💰 Available USDT: {usdt_balance:.4f}, 4% per order: {dynamic_usd:.4f}")
+        if usdt_balance is None:
+            usdt_balance = exchange.fetch_balance()["USDT"]["free"]
+        log.info(f"💰 Available USDT: {usdt_balance:.4f}, flat sizing per symbol")
 
-        for sym in CONFIG:
-            CONFIG[sym]["usd_per_order"] = dynamic_usd
+        for sym, cfg in CONFIG.items():
+            cfg["usd_per_order"] = round(usdt_balance * cfg.get("allocation_percent", percent), 4)
 
     except Exception as e:
         log.error(f"❌ Failed to fetch balance or update config: {e}")
 
+@profiled("phase:allocations")
+def update_config_with_allocations(CONFIG, exchange, usdt_balance=None):
+    """
+    Decide bands and usd_per_order for every symbol in one vectorized pass.
+    The total budget matches the flat sizing (allocation_percent of free USDT
+    per symbol) but is redistributed towards the pairs that actually turn over.
+    `usdt_balance` is passed in by the shard coordinator; otherwise it's fetched.
+    Returns the batched tickers ({} if they couldn't be fetched).
+    """
+    from allocation import (
+        LOOKBACK_DAYS, band_spacing, build_stats, compute_allocations,
+        load_fill_counts, save_allocations,
+    )
+
+    tickers = {}
+    try:
+        if usdt_balance is None:
+            usdt_balance = exchange.fetch_balance()["USDT"]["free"]
+        symbols = [sym for sym in CONFIG if sym in get_markets()]
+        tickers = exchange.fetch_tickers(symbols)
+
+        spacings = {
+            sym: band_spacing(
+                grid_for(sym, CONFIG[sym]),
+                (tickers.get(sym) or {}).get("last") or 0.0,
+            )
+            for sym in symbols
+        }
+        since = clock.now() - timedelta(days=LOOKBACK_DAYS)
+        stats = build_stats(tickers, spacings, load_fill_counts(get_db(), since), CONFIG)
+
+        budget = usdt_balance * sum(CONFIG[sym]["allocation_percent"] for sym in symbols)
+        alloc = compute_allocations(stats, budget)
+        log.info(f"💰 Available USDT: {usdt_balance:.4f}, allocating {budget:.4f} across {len(symbols)} symbols")
+
+        for sym, row in alloc.iterrows():
+            CONFIG[sym]["bands"] = int(row.bands)
+            CONFIG[sym]["usd_per_order"] = float(row.usd_per_order)
+            log.info(
+                f"{sym} 📐 bands={int(row.bands)} usd/order={row.usd_per_order:.4f} "
+                f"(vol={row.vol:.4f} spacing={row.spacing:.4f} fills/day={row.fill_rate:.2f} share={row.weight:.3f})"
+            )
+        save_allocations(get_db(), alloc, clock.now())
+
+    except Exception as e:
+        log.error(f"❌ Allocation failed, falling back to flat sizing: {e}")
+        update_config_with_dynamic_usdt(CONFIG, exchange, usdt_balance=usdt_balance)
+    return tickers
+
+@profiled("phase:plan_fill_checks")
+def plan_fill_checks(symbols, tickers):
+    """
+    {symbol: (probability, reconcile, reason)}: which symbols are worth a
+    check_fills_for_symbol this cycle (see fill_model.py). If the plan can't be
+    made, everything is checked.
+    """
+    from allocation import LOOKBACK_DAYS, load_fill_counts
+
+    try:
+        now = clock.now()
+        fills = load_fill_counts(get_db(), now - timedelta(days=LOOKBACK_DAYS))
+        return plan_reconciliation(get_db(), tickers, symbols, now, fills, LOOKBACK_DAYS)
+    except Exception as e:
+        log.error(f"⚠️ Fill-check planning failed, checking every symbol: {e}")
+        return {sym: (1.0, True, "planning failed") for sym in symbols}
+
+@profiled("phase:plan_maintenance")
+def plan_band_maintenance(config, symbols, tickers):
+    """
+    {symbol: (band_index, maintain, reason)}: which symbols need seed_grid /
+    set_band_close this cycle (see band_tracker.py). If the plan can't be
+    made, everything is maintained.
+    """
+    try:
+        grids = {sym: grid_for(sym, config[sym]) for sym in symbols}
+        return plan_maintenance(get_db(), tickers, grids, config, clock.now())
+    except Exception as e:
+        log.error(f"⚠️ Band maintenance planning failed, maintaining every symbol: {e}")
+        return {sym: (None, True, "planning failed") for sym in symbols}
+
+# Symbols taken out of gridbot.toml (or set enabled = false) with bands still in
+# flight: fills are still checked and coins still sold, nothing new is seeded
+WIND_DOWN_MINUTES = 5
+_WOUND_DOWN_AT = {}
+
+def winding_down_symbols(config):
+    """Symbols in the DB with rows not completed (or dust) that aren't in `config`."""
+    rows = get_db().execute("""
+        SELECT DISTINCT symbol FROM grid_pairs WHERE status NOT IN ('completed', 'dust')
+    """).fetchall()
+    return sorted(sym for (sym,) in rows if sym not in config)
+
+@profiled("phase:wind_down")
+def wind_down_symbols():
+    """Fill checks and sells for winding-down symbols, at most every WIND_DOWN_MINUTES each."""
+    now = clock.now()
+    for sym in winding_down_symbols(get_config()):
+        last = _WOUND_DOWN_AT.get(sym)
+        if last is not None and now - last < timedelta(minutes=WIND_DOWN_MINUTES):
+            continue
+        if sym not in get_markets():
+            log.warning(f"Skipping {sym}: not on exchange")
+            continue
+        _WOUND_DOWN_AT[sym] = now
+        log.info(f"--- Winding down {sym}: no longer configured, bands still in flight ---")
+        try:
+            check_fills_for_symbol(sym, None)
+            retry_failed_sells_for_symbol(sym)
+        except Exception as e:
+            log.error(f"{sym} ❌ Wind-down failed this run ({type(e).__name__}): {e}")
+
 # ─── MAIN EXECUTION ────────────────────────────────────────────────────────────
-if __name__ == "__main__":
-    log.info("=== GridBot Multi-Symbol Run STARTED ===")
+# Set by --profile; GRIDBOT_PROFILE works too (see profiling.py)
+PROFILE_MODE = None
+
+def run_cycle(symbols=None, usdt_balance=None):
+    """One pass over `symbols` (default: every configured symbol), profiled when enabled."""
+    with profile_run("bot-cycle", PROFILE_MODE):
+        _run_cycle(symbols, usdt_balance)
+
+def _run_cycle(symbols, usdt_balance):
+    config = {sym: get_config()[sym] for sym in (get_config() if symbols is None else symbols)}
+    log.info(f"=== GridBot Multi-Symbol Run STARTED ({len(config)} symbols) ===")
     try:
-        update_config_with_dynamic_usdt(CONFIG, exchange, percent=0.02)
-        for sym, cfg in CONFIG.items():
-            if sym not in markets:
-                log.warning(f"Skipping {sym}: not on exchange")
-                continue
+        # Fee-currency rates are per cycle, not per process (daemon mode runs for weeks)
+        _FEE_RATES.clear()
+        recover_order_intents()
+        tickers = update_config_with_allocations(config, get_exchange(), usdt_balance=usdt_balance) if config else {}
+        _CYCLE_TICKERS.clear()
+        _CYCLE_TICKERS.update(tickers)
+
+        # Likeliest fills first; idle symbols skip the order/trade lookups
+        symbols = [sym for sym in config if sym in get_markets()]
+        for sym in set(config) - set(symbols):
+            log.warning(f"Skipping {sym}: not on exchange")
+        plan = plan_fill_checks(symbols, tickers)
+        symbols.sort(key=lambda sym: plan[sym][0], reverse=True)
+        # Bands only need work once the price crosses a level or a band changes state
+        maintenance = plan_band_maintenance(config, symbols, tickers)
+
+        for sym in symbols:
+            cfg = config[sym]
             log.info(f"--- Processing {sym} ---")
-            check_fills_for_symbol(sym, cfg)
-            retry_failed_sells_for_symbol(sym)
-            seed_grid_for_symbol(sym, cfg)
-            set_band_close(sym, cfg)
+            # A failure stays with its symbol; the rest of the run carries on
+            try:
+                p_fill, reconcile, reason = plan[sym]
+                band, maintain, why = maintenance[sym]
+                # set_band_close cancels 'waiting' rows below the floor; see whether they filled first
+                if maintain and not reconcile and cancels_stale_bands(sym, cfg, (tickers.get(sym) or {}).get("last")):
+                    log.info(f"{sym} 🔎 Fill check forced: band maintenance will cancel stale buys ({reason})")
+                    reconcile = True
+                if reconcile:
+                    check_fills_for_symbol(sym, cfg)
+                    mark_reconciled(get_db(), sym, (tickers.get(sym) or {}).get("last"), clock.now())
+                else:
+                    log.info(f"{sym} 💤 Fill check skipped: p_fill={p_fill:.4f} ({reason})")
+                retry_failed_sells_for_symbol(sym)
+                if maintain:
+                    log.info(f"{sym} 🎚️ Band maintenance: {why}")
+                    seed_grid_for_symbol(sym, cfg)
+                    if set_band_close(sym, cfg) and band is not None:
+                        mark_maintained(get_db(), sym, band, cfg.get("bands", 1),
+                                        grid_signature(cfg, grid_for(sym, cfg)), clock.now())
+                else:
+                    log.info(f"{sym} 💤 Band maintenance skipped: {why}")
+            except Exception as e:
+                log.error(f"{sym} ❌ Symbol failed this run ({type(e).__name__}): {e}")
+
+        wind_down_symbols()
+        # Keeps point-in-time band queries cheap (see band_events.py)
+        maybe_snapshot(get_db())
 
     except Exception as e:
         log.error(f"ERROR DURING RUN: {e}")
     finally:
-        DB.close()
+        log.info("=== GridBot Multi-Symbol Run FINISHED ===")
+
+# Longest the daemon sleeps before re-checking the config file
+DAEMON_POLL = 5.0
+
+def apply_config_changes(watcher):
+    """
+    Pull a reloaded config into get_config(). Only symbols that were added, removed
+    or changed lose their cached grid index; new indexes are built right away
+    so the cost isn't paid mid-cycle. Returns the symbols to run immediately.
+    """
+    config = get_config()
+    added, removed, changed = watcher.poll()
+    for sym in removed | changed:
+        _GRIDS.pop(sym, None)
+        config.pop(sym, None)
+    for sym in set(winding_down_symbols(config)) & removed:
+        log.info(f"{sym} 🪫 Removed from the config with bands in flight: no new buys, fills and sells carry on")
+    for sym in added | changed:
+        config[sym] = watcher.config[sym]
+        grid_for(sym, config[sym])
+    return added | changed
+
+def run_daemon():
+    """Run each symbol on its own interval, hot-reloading gridbot.toml between runs."""
+    config = get_config()
+    watcher = ConfigWatcher(CONFIG_PATH, config)
+    next_due = {}
+    log.info(f"=== GridBot daemon STARTED (config: {CONFIG_PATH}) ===")
+    while True:
+        now = time.monotonic()
+        for sym in apply_config_changes(watcher):
+            next_due[sym] = now
+        next_due = {sym: t for sym, t in next_due.items() if sym in config}
+
+        due = [sym for sym in config if next_due.get(sym, now) <= now]
+        if due:
+            run_cycle(due)
+            done = time.monotonic()
+            for sym in due:
+                next_due[sym] = done + config[sym]["interval"]
+
+        wait = min(next_due.values()) - time.monotonic() if next_due else DAEMON_POLL
+        time.sleep(min(max(wait, 0.0), DAEMON_POLL))
+
+if __name__ == "__main__":
+    setup_logging(LOG_PATH)
+    parser = argparse.ArgumentParser(description="Grid bot")
+    parser.add_argument("--daemon", action="store_true", help="run continuously with config hot reload")
+    parser.add_argument("--profile", nargs="?", const="sample", choices=PROFILE_MODES,
+                        help="profile each cycle into profiles/ (default: sample)")
+    args = parser.parse_args()
+    PROFILE_MODE = args.profile
+    try:
+        if args.daemon:
+            run_daemon()
+        else:
+            run_cycle()
+    except KeyboardInterrupt:
+        log.info("=== Interrupted ===")
+    finally:
+        close_db()
         log.info("=== Database connection closed ===")
-        log.info("=== GridBot Multi-Symbol Run FINISHED ===")
\ No newline at end of file
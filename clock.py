@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+clock.py
+
+The wall clock bot.py and band_events.py read their timestamps from.
+
+  • time()        – unix seconds
+  • now()         – timezone-aware datetime (UTC unless told otherwise)
+  • set_source()  – run on another clock: soak.py installs the simulated
+                    market's, exchange_tape.py replay the recorded one
+"""
+
+import time as _time
+from datetime import datetime, timezone
+
+_source = _time.time
+
+def set_source(source=None):
+    """Read unix time from `source()` from now on; None goes back to the wall clock."""
+    global _source
+    _source = source or _time.time
+
+def time():
+    return _source()
+
+def now(tz=timezone.utc):
+    return datetime.fromtimestamp(_source(), tz)
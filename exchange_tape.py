@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+exchange_tape.py
+
+Record and replay the bot's exchange traffic.
+
+  • GRIDBOT_RECORD=<file>  – every ccxt endpoint call (method, args, result or
+                             error, response headers, wall-clock start, start
+                             offset, duration) is appended to <file> as it happens
+  • GRIDBOT_REPLAY=<file>  – endpoint calls are answered from <file> instead of
+                             the network, at full speed: no rate budget waits,
+                             no retry back-off
+Both hook in at the raw client (bootstrap.build_exchange), so the scheduler,
+retry layer and profiler behave as they would live.
+
+Tape layout: magic b"SFTAPE\\0\\1", then one record per call, each a u32
+length followed by zlib-compressed JSON. Appends only, so a crash loses at
+most the call in flight.
+
+Replay matches each call to the first unused record with the same method and
+arguments, else the same method and identifying strings (symbols, order and
+client ids) - amounts, prices, timestamps and limits can differ. A call with
+neither raises ReplayMismatch rather than getting another call's answer.
+Errors are re-raised as the recorded ccxt class.
+
+The bot's clock is replayed too: replay() installs the recorded time of the
+last answered call as its clock (clock.set_source), as soak.py does with the
+simulated market's.
+
+Usage:
+  GRIDBOT_RECORD=tapes/today.tape ./bot.py
+  ./exchange_tape.py show tapes/today.tape
+  ./exchange_tape.py replay tapes/today.tape --db snapshot.sqlite3 --cycles 3
+"""
+
+import os
+import json
+import time
+import zlib
+import shutil
+import struct
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter, defaultdict, deque
+
+log = logging.getLogger("exchange_tape")
+
+MAGIC  = b"SFTAPE\0\1"
+LENGTH = struct.Struct("<I")
+
+class ReplayMismatch(Exception):
+    """The run asked for something the tape has no (more) answers for."""
+
+active_replay = None   # the ReplayExchange built by wrap_client(), if replaying
+
+# ─── FILE ──────────────────────────────────────────────────────────────────────
+def _encode(record):
+    blob = zlib.compress(json.dumps(record, separators=(",", ":"), default=str).encode())
+    return LENGTH.pack(len(blob)) + blob
+
+def read_tape(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not an exchange tape")
+        while True:
+            head = f.read(LENGTH.size)
+            if len(head) < LENGTH.size:
+                return
+            (size,) = LENGTH.unpack(head)
+            blob = f.read(size)
+            if len(blob) < size:
+                log.warning(f"⚠️ {path}: truncated last record ignored")
+                return
+            yield json.loads(zlib.decompress(blob))
+
+def _identity(value):
+    """The strings in `value` (symbols, order and client ids), in order; numbers and None are dropped."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [s for k in sorted(value) for s in _identity(value[k])]
+    if isinstance(value, (list, tuple)):
+        return [s for v in value for s in _identity(v)]
+    return []
+
+def _keys(method, args, kwargs):
+    """Match keys from most to least specific."""
+    return (
+        json.dumps([method, args, kwargs], sort_keys=True, default=str),
+        json.dumps([method, _identity([args, kwargs])]),
+    )
+
+# ─── RECORD ────────────────────────────────────────────────────────────────────
+class RecordingExchange:
+    """Raw ccxt client wrapper that appends every endpoint call to a tape."""
+
+    def __init__(self, exchange, path):
+        from rate_limiter import ENDPOINT_WEIGHTS
+
+        self._exchange  = exchange
+        self._endpoints = ENDPOINT_WEIGHTS
+        self._lock      = threading.Lock()
+        self._t0        = time.monotonic()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new:
+            self._file.write(MAGIC)
+            self._file.flush()
+        log.info(f"⏺️ Recording exchange traffic to {path}")
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(_encode(record))
+            self._file.flush()
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in self._endpoints or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.monotonic()
+            record = {"method": name, "args": list(args), "kwargs": kwargs,
+                      "ts": round(time.time(), 6), "at": round(start - self._t0, 6)}
+            try:
+                record["result"] = result = attr(*args, **kwargs)
+                return result
+            except Exception as e:
+                record["error"] = [type(e).__name__, str(e)]
+                raise
+            finally:
+                record["elapsed"] = round(time.monotonic() - start, 6)
+                record["headers"] = dict(getattr(self._exchange, "last_response_headers", None) or {})
+                self._append(record)
+        return call
+
+# ─── REPLAY ────────────────────────────────────────────────────────────────────
+class ReplayExchange:
+    """
+    Stands in for a raw ccxt client. Endpoint calls are answered from the tape;
+    everything else (precision helpers, `has`, markets) comes from an offline
+    ccxt instance loaded with the recorded markets. time() is the recorded
+    wall clock at the end of the last answered call.
+    """
+
+    def __init__(self, path, exchange):
+        from rate_limiter import ENDPOINT_WEIGHTS
+
+        self._exchange  = exchange
+        self._endpoints = ENDPOINT_WEIGHTS
+        self._records   = list(read_tape(path))
+        self._used      = [False] * len(self._records)
+        self._index     = defaultdict(deque)
+        self._lock      = threading.Lock()
+        for i, r in enumerate(self._records):
+            for key in _keys(r["method"], r["args"], r["kwargs"]):
+                self._index[key].append(i)
+        self.last_response_headers = {}
+        self.recorded_seconds = sum(r.get("elapsed", 0.0) for r in self._records)
+        self._now = min((r["ts"] for r in self._records if "ts" in r), default=None)
+        if self._now is None:
+            log.warning(f"⚠️ {path} has no recorded clock (older tape); replaying on the wall clock")
+        log.info(f"⏯️ Replaying {len(self._records)} exchange call(s) from {path}")
+
+    @property
+    def remaining(self):
+        return self._used.count(False)
+
+    def time(self):
+        return time.time() if self._now is None else self._now
+
+    def _take(self, method, args, kwargs):
+        with self._lock:
+            for key in _keys(method, list(args), kwargs):
+                queue = self._index.get(key)
+                while queue and self._used[queue[0]]:
+                    queue.popleft()
+                if queue:
+                    i = queue.popleft()
+                    self._used[i] = True
+                    record = self._records[i]
+                    if "ts" in record:
+                        self._now = max(self._now, record["ts"] + record.get("elapsed", 0.0))
+                    return record
+        raise ReplayMismatch(f"no recorded {method}{tuple(args)} left on the tape")
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in self._endpoints or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            import ccxt
+
+            record = self._take(name, args, kwargs)
+            self.last_response_headers = record.get("headers") or {}
+            if "error" in record:
+                cls, message = record["error"]
+                raise getattr(ccxt, cls, ccxt.ExchangeError)(message)
+            if name in ("load_markets", "fetch_markets") and isinstance(record["result"], (dict, list)):
+                self._exchange.set_markets(record["result"])
+            return record["result"]
+        return call
+
+class FreeRunLimiter:
+    """Limiter stand-in for replays: the tape already reflects the real pacing."""
+
+    def acquire(self, weight, priority=None):
+        pass
+
+    def observe(self, headers, throttled=False):
+        pass
+
+# ─── HOOK ──────────────────────────────────────────────────────────────────────
+def is_replaying():
+    return bool(os.getenv("GRIDBOT_REPLAY"))
+
+def wrap_client(exchange):
+    """The raw client, recording or replaying per GRIDBOT_RECORD / GRIDBOT_REPLAY."""
+    global active_replay
+    if is_replaying():
+        active_replay = ReplayExchange(os.environ["GRIDBOT_REPLAY"], exchange)
+        return active_replay
+    if os.getenv("GRIDBOT_RECORD"):
+        return RecordingExchange(exchange, os.environ["GRIDBOT_RECORD"])
+    return exchange
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def show(path):
+    records = list(read_tape(path))
+    calls, errors, seconds = Counter(), Counter(), Counter()
+    for r in records:
+        calls[r["method"]] += 1
+        seconds[r["method"]] += r.get("elapsed", 0.0)
+        if "error" in r:
+            errors[r["method"]] += 1
+    span = records[-1]["at"] + records[-1].get("elapsed", 0.0) if records else 0.0
+    print(f"{path}: {len(records)} calls over {span:.1f}s, {os.path.getsize(path)} bytes")
+    for method, n in calls.most_common():
+        print(f"  {method:<28} {n:>6} calls {seconds[method]:>9.3f}s  {errors[method]:>4} errors")
+
+def replay(path, db, cycles):
+    """Run bot cycles against the tape on a throwaway copy of `db`."""
+    workdir = tempfile.mkdtemp(prefix="gridbot-replay-")
+    db_copy = os.path.join(workdir, "replay.sqlite3")
+    if db:
+        shutil.copyfile(db, db_copy)
+    os.environ.update({
+        "GRIDBOT_REPLAY": path,
+        "GRIDBOT_DB":     db_copy,
+        "GRIDBOT_LOG":    os.path.join(workdir, "replay.log"),
+    })
+    from bootstrap import setup_logging
+    import clock
+    import bot
+
+    setup_logging(bot.LOG_PATH)
+    bot.get_exchange()
+    tape = active_replay
+    clock.set_source(tape.time)
+    start = time.perf_counter()
+    try:
+        for _ in range(cycles):
+            bot.run_cycle()
+    finally:
+        bot.close_db()
+        clock.set_source(None)
+    elapsed = time.perf_counter() - start
+
+    log.info(
+        f"⏯️ Replayed {cycles} cycle(s) in {elapsed:.2f}s "
+        f"(recorded calls took {tape.recorded_seconds:.2f}s), {tape.remaining} call(s) left on the tape; "
+        f"DB and log in {workdir}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay a recorded exchange tape.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_show = sub.add_parser("show", help="summarize a tape")
+    p_show.add_argument("tape")
+    p_replay = sub.add_parser("replay", help="run bot cycles against a tape")
+    p_replay.add_argument("tape")
+    p_replay.add_argument("--db", help="DB snapshot to start from (copied, never modified)")
+    p_replay.add_argument("--cycles", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        show(args.tape)
+    else:
+        replay(os.path.abspath(args.tape), args.db, args.cycles)
+
+if __name__ == "__main__":
+    main()
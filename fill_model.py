@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+fill_model.py
+
+Decides which symbols need fill reconciliation (fetch_open_orders, fetch_order,
+trades) this cycle, from data the cycle already has.
+
+For every active band (waiting/partially_filled buys, holding sells):
+  • crossed        – price has been through the level since the last check
+                     (last checked price vs. now): certain, p = 1
+  • partial        – a buy already part-filled: always checked, p = 1
+  • barrier model  – otherwise, the chance a driftless random walk with the
+                     symbol's Parkinson volatility (24h high/low of the batched
+                     tickers) touched the level in the time since the last check
+A symbol's score also folds in its historical fill rate from grid_pairs (a
+Poisson floor), so pairs that fill often keep being looked at.
+
+Symbols scoring under the threshold are skipped; nothing goes unchecked for
+longer than MAX_SKIP_MINUTES.
+"""
+
+import math
+import logging
+from datetime import datetime
+
+log = logging.getLogger("fill_model")
+
+TABLE = "reconcile_state"
+
+# ─── DEFAULTS ──────────────────────────────────────────────────────────────────
+RECONCILE_THRESHOLD = 0.02     # check a symbol once its fill probability reaches this
+MAX_SKIP_MINUTES    = 60       # ...and at least this often regardless
+MIN_DAILY_VOL       = 0.01     # floor when the 24h range is missing or flat
+
+PARKINSON = 1.0 / math.sqrt(4.0 * math.log(2.0))
+
+# ─── PERSISTENCE ───────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        symbol          TEXT PRIMARY KEY,
+        checked_at      TIMESTAMP NOT NULL,
+        price           REAL
+    )
+    """)
+
+def load_state(conn):
+    """{symbol: (checked_at, price)} as of each symbol's last reconciliation."""
+    ensure_table(conn)
+    rows = conn.execute(f"SELECT symbol, checked_at, price FROM {TABLE}").fetchall()
+    return {sym: (datetime.fromisoformat(str(ts)), price) for sym, ts, price in rows}
+
+def mark_reconciled(conn, symbol, price, now):
+    ensure_table(conn)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {TABLE} (symbol, checked_at, price) VALUES (?, ?, ?)
+    """, (symbol, now, price))
+    conn.commit()
+
+def load_active_levels(conn, symbols):
+    """{symbol: [(side, level, status), ...]} for every band with an order on the book."""
+    marks = ",".join("?" * len(symbols))
+    rows = conn.execute(f"""
+        SELECT symbol, status, buy_price, sell_price FROM grid_pairs
+         WHERE symbol IN ({marks}) AND status IN ('waiting','partially_filled','holding')
+    """, list(symbols)).fetchall()
+    levels = {sym: [] for sym in symbols}
+    for sym, status, buy_price, sell_price in rows:
+        if status == "holding":
+            levels[sym].append(("sell", sell_price, status))
+        else:
+            levels[sym].append(("buy", buy_price, status))
+    return levels
+
+# ─── MODEL ─────────────────────────────────────────────────────────────────────
+def daily_vol(ticker):
+    high, low = (ticker or {}).get("high"), (ticker or {}).get("low")
+    if not high or not low or high < low:
+        return MIN_DAILY_VOL
+    return max(math.log(high / low) * PARKINSON, MIN_DAILY_VOL)
+
+def touch_probability(level, price, vol, days):
+    """P(a driftless log random walk from `price` reaches `level` within `days`)."""
+    if days <= 0:
+        return 0.0
+    distance = abs(math.log(level / price))
+    return math.erfc(distance / (vol * math.sqrt(2.0 * days)))
+
+def band_probability(side, level, status, price, last_price, vol, days):
+    if status == "partially_filled":
+        return 1.0
+    lo, hi = min(price, last_price), max(price, last_price)
+    if (side == "buy" and lo <= level) or (side == "sell" and hi >= level):
+        return 1.0
+    return touch_probability(level, price, vol, days)
+
+# ─── PLAN ──────────────────────────────────────────────────────────────────────
+def plan_reconciliation(conn, tickers, symbols, now, fill_counts=None, lookback_days=7,
+                        threshold=RECONCILE_THRESHOLD, max_skip_minutes=MAX_SKIP_MINUTES):
+    """
+    {symbol: (probability, reconcile, reason)} for `symbols`. `tickers` are the
+    cycle's batched tickers; `fill_counts` completed pairs per symbol over
+    `lookback_days` (see allocation.load_fill_counts).
+    """
+    fill_counts = fill_counts or {}
+    state  = load_state(conn)
+    levels = load_active_levels(conn, symbols)
+
+    plan = {}
+    for sym in symbols:
+        price = ((tickers or {}).get(sym) or {}).get("last")
+        last_checked, last_price = state.get(sym, (None, None))
+        if not levels[sym]:
+            plan[sym] = (0.0, False, "no orders on the book")
+            continue
+        if not price or not last_price or last_checked is None:
+            plan[sym] = (1.0, True, "no reference price")
+            continue
+        minutes = (now - last_checked).total_seconds() / 60.0
+        if minutes >= max_skip_minutes:
+            plan[sym] = (1.0, True, f"unchecked for {minutes:.0f} min")
+            continue
+
+        days = minutes / 1440.0
+        vol = daily_vol(tickers[sym])
+        miss = math.exp(-fill_counts.get(sym, 0) / lookback_days * days)
+        for side, level, status in levels[sym]:
+            miss *= 1.0 - band_probability(side, level, status, price, last_price, vol, days)
+        p = 1.0 - miss
+        plan[sym] = (p, p >= threshold, f"{len(levels[sym])} band(s), {minutes:.0f} min since check")
+    return plan
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+fills.py
+
+Trade aggregation for fill accounting.
+
+One fetch_my_trades per symbol is aggregated per order in a single pandas pass:
+  • filled / cost / average price over *all* trades of an order
+  • fees split by currency, then normalized:
+      - base-currency fees reduce the quantity we actually hold
+      - quote-currency fees reduce proceeds
+      - anything else (BNB) is converted to quote at the given rate
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "filled", "cost", "price", "trades",
+    "fee_base", "fee_quote", "fee_other_quote", "fee_quote_equiv",
+    "net_base", "net_quote", "fees_data",
+]
+
+def _trade_fees(trade):
+    # ccxt puts every fee in `fees`; `fee` is the single-fee shorthand
+    fees = trade.get("fees") or ([trade["fee"]] if trade.get("fee") else [])
+    return [f for f in fees if f and f.get("cost")]
+
+def fee_currencies(trades):
+    return {f["currency"] for t in trades for f in _trade_fees(t)}
+
+def aggregate_trades(trades, base, quote, rates=None):
+    """
+    Aggregate ccxt trades into one row per order id (see COLUMNS).
+    `rates` maps other fee currencies to their price in `quote`; fees in a
+    currency without a rate count as NaN in fee_other_quote/fee_quote_equiv.
+    """
+    rates = rates or {}
+    if not trades:
+        return pd.DataFrame(columns=COLUMNS)
+
+    df = pd.DataFrame({
+        "order":  [t.get("order") for t in trades],
+        "amount": [t.get("amount") or 0.0 for t in trades],
+        "cost":   [t.get("cost") or 0.0 for t in trades],
+    })
+    agg = df.groupby("order").agg(
+        filled=("amount", "sum"),
+        cost=("cost", "sum"),
+        trades=("amount", "size"),
+    )
+    agg["price"] = agg["cost"] / agg["filled"].replace(0.0, np.nan)
+
+    fees = pd.DataFrame(
+        [(t.get("order"), f["currency"], float(f["cost"])) for t in trades for f in _trade_fees(t)],
+        columns=["order", "currency", "cost"],
+    )
+    by_ccy = fees.pivot_table(index="order", columns="currency", values="cost",
+                              aggfunc="sum", fill_value=0.0).reindex(agg.index, fill_value=0.0)
+
+    zero = pd.Series(0.0, index=agg.index)
+    agg["fee_base"]  = by_ccy[base] if base in by_ccy else zero
+    agg["fee_quote"] = by_ccy[quote] if quote in by_ccy else zero
+
+    other = by_ccy.drop(columns=[base, quote], errors="ignore")
+    if other.shape[1] == 0:
+        agg["fee_other_quote"] = zero
+    else:
+        rate_vec = pd.Series({ccy: rates.get(ccy, np.nan) for ccy in other.columns})
+        converted = other.mul(rate_vec, axis=1)
+        # only propagate a missing rate where that currency was actually charged
+        converted = converted.where(other != 0, 0.0)
+        agg["fee_other_quote"] = converted.sum(axis=1, skipna=False)
+
+    agg["fee_quote_equiv"] = agg["fee_quote"] + agg["fee_base"] * agg["price"].fillna(0.0) + agg["fee_other_quote"]
+    agg["net_base"]  = agg["filled"] - agg["fee_base"]
+    agg["net_quote"] = agg["cost"] - agg["fee_quote"]
+
+    fees_data = {
+        order: json.dumps({ccy: cost for ccy, cost in row.items() if cost})
+        for order, row in by_ccy.iterrows()
+    }
+    agg["fees_data"] = [fees_data.get(order, "{}") for order in agg.index]
+    return agg[COLUMNS]
+
+def order_summary(agg, order_id):
+    """The aggregated row for `order_id` as a dict, or None if no trades were seen."""
+    if order_id not in agg.index:
+        return None
+    return agg.loc[order_id].to_dict()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+grid_config.py
+
+Loads and validates gridbot.toml - the one place symbols are configured for
+bot.py, prune_excess_bands.py, remove_losers.py and shard_runner.py - and
+watches it for changes so a running daemon can hot-reload it. The file is
+read on the first get_config(), not at import.
+
+Per symbol:
+  • grid_file           – CSV under grids/ (a fresh .grid next to it is used if present)
+  • max_bands           – upper bound on bands the allocator may keep under price
+  • allocation_percent  – share of free USDT this symbol is sized from
+  • interval            – seconds between runs of this symbol in daemon mode
+  • enabled             – false keeps the symbol configured but idle
+
+Disabling or removing a symbol stops new buys only: bands it still has in
+flight are seen through by bot.py's wind-down (fill checks and sells).
+"""
+
+import os
+import logging
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+log = logging.getLogger("grid_config")
+
+CONFIG_PATH = os.getenv("GRIDBOT_CONFIG", "gridbot.toml")
+GRID_DIR    = "grids"
+
+DEFAULTS = {
+    "max_bands":          4,
+    "allocation_percent": 0.02,
+    "interval":           300,
+    "enabled":            True,
+}
+
+class ConfigError(ValueError):
+    pass
+
+# ─── VALIDATION ────────────────────────────────────────────────────────────────
+def _check(cond, where, msg):
+    if not cond:
+        raise ConfigError(f"{where}: {msg}")
+
+def _validate_symbol(sym, cfg, grid_dir):
+    where = f"symbols.\"{sym}\""
+    _check(sym.count("/") == 1 and all(sym.split("/")), where, "symbol must look like BASE/QUOTE")
+
+    unknown = set(cfg) - set(DEFAULTS) - {"grid_file"}
+    _check(not unknown, where, f"unknown key(s) {sorted(unknown)}")
+
+    grid_file = cfg.get("grid_file")
+    _check(isinstance(grid_file, str) and grid_file, where, "grid_file is required")
+    _check(os.path.isfile(os.path.join(grid_dir, grid_file)), where, f"{grid_dir}/{grid_file} not found")
+
+    max_bands = cfg["max_bands"]
+    _check(isinstance(max_bands, int) and not isinstance(max_bands, bool) and 1 <= max_bands <= 50,
+           where, "max_bands must be an integer in 1..50")
+
+    pct = cfg["allocation_percent"]
+    _check(isinstance(pct, (int, float)) and 0 < pct <= 1, where, "allocation_percent must be in (0, 1]")
+
+    interval = cfg["interval"]
+    _check(isinstance(interval, (int, float)) and interval > 0, where, "interval must be > 0 seconds")
+
+    _check(isinstance(cfg["enabled"], bool), where, "enabled must be true/false")
+
+def parse_config(raw, grid_dir=GRID_DIR):
+    """Validated {symbol: cfg} from the parsed TOML document (enabled symbols only)."""
+    defaults = {**DEFAULTS, **raw.get("defaults", {})}
+    unknown = set(defaults) - set(DEFAULTS)
+    _check(not unknown, "defaults", f"unknown key(s) {sorted(unknown)}")
+
+    symbols = raw.get("symbols")
+    _check(isinstance(symbols, dict) and symbols, "symbols", "at least one symbol is required")
+
+    config = {}
+    for sym, cfg in symbols.items():
+        cfg = {**defaults, **cfg}
+        _validate_symbol(sym, cfg, grid_dir)
+        if cfg["enabled"]:
+            config[sym] = cfg
+    return config
+
+def load_config(path=CONFIG_PATH):
+    with open(path, "rb") as f:
+        return parse_config(tomllib.load(f))
+
+# ─── HOT RELOAD ────────────────────────────────────────────────────────────────
+class ConfigWatcher:
+    """
+    Polls the config file's mtime. On change, re-validates it and reports which
+    symbols were added, removed or changed; an invalid file is logged and the
+    last good config stays in force.
+    """
+
+    def __init__(self, path=CONFIG_PATH, config=None):
+        self.path   = path
+        self._mtime = self._stat()
+        self.config = config if config is not None else load_config(path)
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def poll(self):
+        """Return (added, removed, changed) symbol sets; all empty if nothing changed."""
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return set(), set(), set()
+        self._mtime = mtime
+
+        try:
+            new = load_config(self.path)
+        except (OSError, ConfigError, tomllib.TOMLDecodeError) as e:
+            log.error(f"❌ Config reload failed, keeping previous config: {e}")
+            return set(), set(), set()
+
+        old = self.config
+        added   = set(new) - set(old)
+        removed = set(old) - set(new)
+        changed = {
+            sym for sym in set(new) & set(old)
+            if any(new[sym][k] != old[sym].get(k) for k in new[sym])
+        }
+        self.config = new
+        log.info(f"🔄 Config reloaded: +{sorted(added)} -{sorted(removed)} ~{sorted(changed)}")
+        return added, removed, changed
+
+# ─── LAZY CONFIG ───────────────────────────────────────────────────────────────
+_config = None
+
+def get_config():
+    """{symbol: cfg} from CONFIG_PATH, loaded on first use; callers may update it in place."""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
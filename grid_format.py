@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+grid_format.py
+
+Compact binary price grids (*.grid) and the PriceGrid view the bot reads them through.
+
+File layout (little-endian):
+  header  32 bytes  magic b"SFGRID\\0\\0", version u32, flags u32, count u64, tick f64
+  levels  count × float64, sorted ascending
+
+The levels are mmap'ed and exposed as a memoryview, so loading costs no
+parsing no matter how many levels there are. The CSV stays the source of truth
+for hand-made grids; a .grid next to it (and at least as new) takes precedence.
+"""
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+MAGIC   = b"SFGRID\0\0"
+VERSION = 1
+HEADER  = struct.Struct("<8sIIQd")
+
+# ─── WRITE ─────────────────────────────────────────────────────────────────────
+def write_grid(path, prices, tick=0.0):
+    """Write sorted, de-duplicated `prices` to `path` atomically."""
+    levels = array("d", sorted(set(float(p) for p in prices)))
+    if sys.byteorder != "little":
+        levels.byteswap()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(levels), float(tick)))
+        levels.tofile(f)
+    os.replace(tmp, path)
+
+def write_csv(path, prices):
+    """Same layout the hand-made grids use: one price per line, high → low."""
+    with open(path, "w", newline="") as f:
+        for p in sorted(set(prices), reverse=True):
+            f.write(f"{p!r}\n")
+
+# ─── READ ──────────────────────────────────────────────────────────────────────
+def read_grid(path):
+    """Return (levels, tick) with `levels` an ascending float64 memoryview over the file."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path}: truncated grid header")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, _flags, count, tick = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a grid file")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported grid version {version}")
+    if size != HEADER.size + count * 8:
+        raise ValueError(f"{path}: expected {count} levels, file size is {size}")
+
+    levels = memoryview(mm)[HEADER.size:].cast("d")
+    if sys.byteorder != "little":
+        swapped = array("d", levels)
+        swapped.byteswap()
+        levels = memoryview(swapped)
+    return levels, tick
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return array("d", sorted(float(line.strip()) for line in f if line.strip()))
+
+def binary_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".grid"
+
+# ─── VIEW ──────────────────────────────────────────────────────────────────────
+class PriceGrid:
+    """
+    (buy, sell) bands, highest first, over an ascending level array - the same
+    sequence the old list-of-tuples load_price_grid returned, without building it.
+    """
+
+    def __init__(self, levels, tick=0.0, start=0, stop=None):
+        self.levels = levels
+        self.tick   = tick
+        bands       = max(len(levels) - 1, 0)
+        self._start = start
+        self._stop  = bands if stop is None else stop
+
+    def __len__(self):
+        return max(self._stop - self._start, 0)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return PriceGrid(self.levels, self.tick, self._start + start, self._start + max(stop, start))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("band index out of range")
+        top = len(self.levels) - 1 - (self._start + i)
+        return (self.levels[top - 1], self.levels[top])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def band_index(self, price):
+        """Number of levels strictly below `price` (a bisect over the levels)."""
+        return bisect_left(self.levels, price)
+
+    def below(self, price):
+        """Bands whose buy level is under `price`, highest first."""
+        k = self.band_index(price)
+        first = len(self.levels) - 1 - k
+        return self[max(first - self._start, 0):]
+
+# ─── LOAD ──────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=64)
+def _load(path, csv_mtime, bin_mtime):
+    if bin_mtime is not None and (csv_mtime is None or bin_mtime >= csv_mtime):
+        levels, tick = read_grid(binary_path(path))
+        return PriceGrid(levels, tick)
+    return PriceGrid(read_csv(path))
+
+def load_grid(path):
+    """PriceGrid for a grids/*.csv path, preferring the binary sibling when fresh."""
+    def mtime(p):
+        try:
+            return os.stat(p).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    return _load(path, mtime(path), mtime(binary_path(path)))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+make_grid.py
+
+Generates price grids for grids/ and writes each one twice: the usual CSV
+(one price per line, high → low) and a binary .grid next to it that
+load_price_grid reads with no parsing (see grid_format.py).
+
+Spacing:
+  • geometric   – each level is `--step` (fraction) above the previous one
+  • arithmetic  – each level is `--step` (price units) above the previous one
+  • volatility  – geometric, with the step set to `--vol-mult` × daily volatility
+                  (from `--vol`, or 30 daily candles fetched from the exchange)
+
+Every level is snapped to the market's tick size (`--tick`, or loaded from the
+exchange) and de-duplicated.
+
+Usage:
+  ./make_grid.py SOL/USDT --lower 80 --upper 250 --step 0.01
+  ./make_grid.py XRP/USDT --lower 1 --upper 4 --spacing arithmetic --step 0.01 --tick 0.0001
+  ./make_grid.py ETH/USDT --lower 1500 --upper 5000 --spacing volatility --vol-mult 0.25
+  ./make_grid.py --convert grids/*.csv
+"""
+
+import os
+import math
+import argparse
+import statistics
+
+from grid_format import binary_path, read_csv, write_csv, write_grid
+
+GRID_DIR = "grids"
+
+_exchange = None
+
+def get_exchange():
+    """Public (no keys) exchange client, only built when the CLI needs market data."""
+    global _exchange
+    if _exchange is None:
+        import ccxt
+        _exchange = ccxt.binanceus({"enableRateLimit": True})
+        _exchange.load_markets()
+    return _exchange
+
+# ─── SPACING ───────────────────────────────────────────────────────────────────
+def geometric_levels(lower, upper, step):
+    n = int(math.floor(math.log(upper / lower) / math.log1p(step)))
+    return [lower * (1.0 + step) ** i for i in range(n + 1)]
+
+def arithmetic_levels(lower, upper, step):
+    n = int(math.floor((upper - lower) / step + 1e-9))
+    return [lower + step * i for i in range(n + 1)]
+
+def daily_volatility(symbol, days=30):
+    candles = get_exchange().fetch_ohlcv(symbol, timeframe="1d", limit=days + 1)
+    closes = [c[4] for c in candles]
+    returns = [math.log(b / a) for a, b in zip(closes, closes[1:])]
+    return statistics.stdev(returns)
+
+def snap_to_tick(levels, tick):
+    if not tick:
+        return sorted(set(levels))
+    decimals = max(0, -int(math.floor(math.log10(tick))))
+    return sorted({round(round(p / tick) * tick, decimals) for p in levels if p >= tick})
+
+def market_tick(symbol):
+    import ccxt
+    from sizing import precision_step
+
+    exchange = get_exchange()
+    return precision_step(exchange.market(symbol)["precision"]["price"],
+                          exchange.precisionMode == ccxt.TICK_SIZE)
+
+# ─── OUTPUT ────────────────────────────────────────────────────────────────────
+def grid_name(symbol, step):
+    """Same naming as the hand-made grids: BASE-QUOTE-<step in tenths of a percent>."""
+    base, quote = symbol.split("/")
+    return f"{base}-{quote}-{int(round(step * 1000)):02d}.csv"
+
+def save(csv_path, levels, tick):
+    write_csv(csv_path, levels)
+    write_grid(binary_path(csv_path), levels, tick)
+    print(f"Wrote {len(levels)} levels → {csv_path} (+ {os.path.basename(binary_path(csv_path))})")
+
+def convert(csv_paths):
+    """Write a .grid next to each existing CSV (levels unchanged)."""
+    for path in csv_paths:
+        levels = read_csv(path)
+        write_grid(binary_path(path), levels)
+        print(f"Converted {path}: {len(levels)} levels")
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Generate grid price levels.")
+    parser.add_argument("symbol", nargs="?", help="e.g. SOL/USDT")
+    parser.add_argument("--lower", type=float)
+    parser.add_argument("--upper", type=float)
+    parser.add_argument("--spacing", choices=["geometric", "arithmetic", "volatility"], default="geometric")
+    parser.add_argument("--step", type=float, help="fraction (geometric) or price units (arithmetic)")
+    parser.add_argument("--vol", type=float, help="daily volatility; fetched when omitted")
+    parser.add_argument("--vol-mult", type=float, default=0.25)
+    parser.add_argument("--tick", type=float, help="price tick; loaded from the exchange when omitted")
+    parser.add_argument("--out", help=f"CSV path (default {GRID_DIR}/BASE-QUOTE-NN.csv)")
+    parser.add_argument("--convert", nargs="+", metavar="CSV", help="only write .grid files for existing CSVs")
+    args = parser.parse_args()
+
+    if args.convert:
+        convert(args.convert)
+        return
+
+    if not (args.symbol and args.lower and args.upper) or args.lower >= args.upper:
+        parser.error("symbol, --lower and --upper (lower < upper) are required")
+
+    if args.spacing == "volatility":
+        vol = args.vol if args.vol is not None else daily_volatility(args.symbol)
+        step = args.vol_mult * vol
+        print(f"{args.symbol}: daily vol {vol:.4f} → step {step:.4%}")
+        levels = geometric_levels(args.lower, args.upper, step)
+    elif args.step is None:
+        parser.error("--step is required for geometric/arithmetic spacing")
+    elif args.spacing == "geometric":
+        step = args.step
+        levels = geometric_levels(args.lower, args.upper, step)
+    else:
+        step = args.step / args.lower
+        levels = arithmetic_levels(args.lower, args.upper, args.step)
+
+    tick = args.tick if args.tick is not None else market_tick(args.symbol)
+    levels = snap_to_tick(levels, tick)
+    if len(levels) < 2:
+        parser.error("grid has fewer than two levels after tick snapping")
+
+    out = args.out or os.path.join(GRID_DIR, grid_name(args.symbol, step))
+    save(out, levels, tick)
+
+if __name__ == "__main__":
+    main()
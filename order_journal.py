@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+order_journal.py
+
+Write-ahead journal of order intents, keyed by deterministic client order ids.
+
+Every order is journalled (and committed) *before* it is sent to the exchange,
+using a clientOrderId derived from symbol, side, band and generation. After a
+crash, the open intents are the only orders that can be live but untracked, and
+each one is resolved with a single lookup by client id - no sweep over all open
+orders and trades.
+
+States:
+  • intent    – journalled, outcome unknown (may or may not be on the exchange)
+  • recorded  – order accepted and written to grid_pairs
+  • failed    – order rejected or never reached the exchange
+"""
+
+import hashlib
+import logging
+
+log = logging.getLogger("order_journal")
+
+TABLE = "order_intents"
+
+STATE_INTENT   = "intent"
+STATE_RECORDED = "recorded"
+STATE_FAILED   = "failed"
+
+# ─── SCHEMA ────────────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        client_order_id     TEXT PRIMARY KEY,
+        symbol              TEXT NOT NULL,
+        side                TEXT NOT NULL,
+        band                REAL NOT NULL,
+        generation          INTEGER NOT NULL,
+        pair_id             INTEGER,
+        amount              REAL,
+        price               REAL,
+        order_id            TEXT,
+        state               TEXT NOT NULL,
+        created             TIMESTAMP,
+        updated             TIMESTAMP
+    )
+    """)
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS {TABLE}_band
+        ON {TABLE} (symbol, side, band, generation)
+    """)
+    # Recovery only ever looks at open intents; keep that lookup O(pending)
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS {TABLE}_open
+        ON {TABLE} (pair_id, side) WHERE state = '{STATE_INTENT}'
+    """)
+
+# ─── IDS ───────────────────────────────────────────────────────────────────────
+def client_order_id(symbol, side, band, generation):
+    """
+    Stable id for the `generation`-th order on this band. Binance allows
+    [.A-Z:/a-z0-9_-]{1,36}, so the symbol/band part is hashed.
+    """
+    digest = hashlib.sha1(f"{symbol}|{side}|{band!r}".encode()).hexdigest()[:20]
+    return f"sf{side[0]}-{digest}-{generation}"
+
+def next_generation(conn, symbol, side, band):
+    cur = conn.execute(f"""
+        SELECT MAX(generation) FROM {TABLE}
+         WHERE symbol = ? AND side = ? AND band = ?
+    """, (symbol, side, band))
+    last = cur.fetchone()[0]
+    return 0 if last is None else last + 1
+
+# ─── JOURNAL ───────────────────────────────────────────────────────────────────
+def write_intent(conn, symbol, side, band, amount, price, pair_id, now):
+    """Journal a new intent and return its client order id. Caller commits."""
+    generation = next_generation(conn, symbol, side, band)
+    cid = client_order_id(symbol, side, band, generation)
+    conn.execute(f"""
+        INSERT INTO {TABLE} (
+            client_order_id, symbol, side, band, generation, pair_id,
+            amount, price, state, created, updated
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (cid, symbol, side, band, generation, pair_id, amount, price, STATE_INTENT, now, now))
+    return cid
+
+def mark(conn, cid, state, now, order_id=None):
+    """Move an intent to `state`. Caller commits (together with grid_pairs)."""
+    conn.execute(f"""
+        UPDATE {TABLE}
+           SET state = ?, order_id = COALESCE(?, order_id), updated = ?
+         WHERE client_order_id = ?
+    """, (state, order_id, now, cid))
+
+def open_intents(conn, symbol=None):
+    """Intents whose outcome is still unknown."""
+    sql = f"""
+        SELECT client_order_id, symbol, side, band, pair_id, amount, price
+          FROM {TABLE}
+         WHERE state = '{STATE_INTENT}'
+    """
+    args = ()
+    if symbol is not None:
+        sql += " AND symbol = ?"
+        args = (symbol,)
+    return conn.execute(sql, args).fetchall()
+
+def has_open_intent(conn, pair_id, side):
+    cur = conn.execute(f"""
+        SELECT 1 FROM {TABLE}
+         WHERE pair_id = ? AND side = ? AND state = '{STATE_INTENT}'
+         LIMIT 1
+    """, (pair_id, side))
+    return cur.fetchone() is not None
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+order_payloads.py
+
+Raw exchange order payloads, kept out of grid_pairs.
+
+  • One zlib-compressed JSON blob per order id, tagged with its pair and side
+  • Written when an order is recorded, read back only when someone asks for it
+    (debugging, audits) - the bot's loops never load them
+  • migrate_raw_json() moves the legacy buy_raw_json/sell_raw_json columns over
+    and clears them in batches (no long lock), then VACUUMs once so the file
+    actually shrinks. It runs once per DB: PRAGMA user_version records it
+"""
+
+import json
+import zlib
+import logging
+
+log = logging.getLogger("order_payloads")
+
+TABLE = "order_payloads"
+
+COMPRESS_LEVEL = 6
+MIGRATE_BATCH  = 500
+MIGRATED       = 1      # PRAGMA user_version once migrate_raw_json() has run
+
+# ─── SCHEMA ────────────────────────────────────────────────────────────────────
+def ensure_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        order_id            TEXT PRIMARY KEY,
+        pair_id             INTEGER,
+        side                TEXT NOT NULL,
+        payload             BLOB NOT NULL,
+        created             TIMESTAMP
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_pair ON {TABLE} (pair_id, side)")
+
+# ─── ENCODING ──────────────────────────────────────────────────────────────────
+def encode(order):
+    return zlib.compress(json.dumps(order, separators=(",", ":"), default=str).encode(), COMPRESS_LEVEL)
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob))
+
+# ─── WRITE / READ ──────────────────────────────────────────────────────────────
+def save_payloads(conn, rows, now):
+    """rows: [(pair_id, side, order), ...]. Caller commits."""
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {TABLE} (order_id, pair_id, side, payload, created)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(o["id"], pair_id, side, encode(o), now) for pair_id, side, o in rows])
+
+def save_payload(conn, pair_id, side, order, now):
+    save_payloads(conn, [(pair_id, side, order)], now)
+
+def load_payload(conn, order_id):
+    """The stored order dict, or None."""
+    row = conn.execute(f"SELECT payload FROM {TABLE} WHERE order_id = ?", (order_id,)).fetchone()
+    return decode(row[0]) if row else None
+
+def load_pair_payloads(conn, pair_id):
+    """{side: order} for one grid_pairs row."""
+    cur = conn.execute(f"SELECT side, payload FROM {TABLE} WHERE pair_id = ?", (pair_id,))
+    return {side: decode(blob) for side, blob in cur}
+
+# ─── MIGRATION ─────────────────────────────────────────────────────────────────
+def migrate_raw_json(conn, table="grid_pairs"):
+    """
+    Move legacy *_raw_json text into the side table; returns how many payloads
+    moved. A no-op on DBs already migrated (or created without the legacy data).
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= MIGRATED:
+        return 0
+    moved = 0
+    for side in ("buy", "sell"):
+        col, oid = f"{side}_raw_json", f"{side}_order_id"
+        while True:
+            batch = conn.execute(f"""
+                SELECT id, {oid}, {col}, {side}_order_submitted FROM {table}
+                 WHERE {col} IS NOT NULL
+                 LIMIT {MIGRATE_BATCH}
+            """).fetchall()
+            if not batch:
+                break
+            with conn:
+                rows = []
+                for pair_id, order_id, raw, created in batch:
+                    try:
+                        order = json.loads(raw)
+                    except ValueError:
+                        order = {"raw": raw}
+                    order["id"] = order.get("id") or order_id or f"legacy-{side}-{pair_id}"
+                    rows.append((pair_id, side, order, created))
+                conn.executemany(f"""
+                    INSERT OR IGNORE INTO {TABLE} (order_id, pair_id, side, payload, created)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(o["id"], pair_id, s, encode(o), created) for pair_id, s, o, created in rows])
+                conn.executemany(f"UPDATE {table} SET {col} = NULL WHERE id = ?", [(r[0],) for r in batch])
+            moved += len(batch)
+    if moved:
+        log.info(f"📦 Moved {moved} raw order payload(s) into {TABLE}, compacting the DB...")
+        conn.execute("VACUUM")
+    conn.execute(f"PRAGMA user_version = {MIGRATED}")
+    conn.commit()
+    return moved
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+
+Opt-in profiling for a bot cycle or a maintenance script run.
+
+Enabled with `--profile [cprofile|sample]` on bot.py or GRIDBOT_PROFILE=<mode>
+for any script. Off by default; when off every hook here is a no-op.
+
+  • cprofile  – deterministic cProfile of the whole run → <run>.prof (pstats,
+                snakeviz, gprof2dot), <run>.collapsed rebuilt from its caller
+                graph (counts are microseconds) and the top-N functions by
+                cumulative time
+  • sample    – a sampling thread snapshots every thread's stack each
+                SAMPLE_INTERVAL → <run>.collapsed (folded stacks for
+                flamegraph.pl / speedscope) and the top-N frames by samples
+In both modes, time is also attributed to named sections:
+  • phase:*     – bot phases (check_fills, seed_grid, set_band_close, ...)
+  • endpoint:*  – each ccxt call, measured around the raw client
+  • ratelimit:wait – time spent waiting for the shared request budget
+All of it goes to <run>.txt next to the profile under profiles/ (one set of
+files per run; shard workers each write their own).
+"""
+
+import os
+import sys
+import time
+import pstats
+import logging
+import cProfile
+import functools
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+log = logging.getLogger("profiling")
+
+PROFILE_DIR     = "profiles"
+MODES           = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005    # seconds between stack samples
+TOP_N           = 25
+FOLDED_MIN      = 1e-5     # cprofile folded stacks: paths under this share of the run are dropped
+
+_active = None   # the running Profile, if any
+
+# ─── SECTION TIMINGS ───────────────────────────────────────────────────────────
+class Timings:
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self.totals = defaultdict(lambda: [0, 0.0, 0.0])   # name → [count, total, max]
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self.totals[name]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def report(self):
+        lines = [f"{'section':<40} {'calls':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (count, total, worst) in sorted(self.totals.items(), key=lambda kv: kv[1][1], reverse=True):
+            lines.append(f"{name:<40} {count:>7} {total:>10.3f} {total / count * 1000:>10.1f} {worst * 1000:>10.1f}")
+        return "\n".join(lines)
+
+def is_active():
+    return _active is not None
+
+@contextmanager
+def timed(name):
+    """Attribute the wrapped block's wall time to `name` (no-op unless profiling)."""
+    if _active is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _active.timings.record(name, time.perf_counter() - start)
+
+def profiled(name):
+    """Decorator form of timed()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with timed(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+class ProfiledExchange:
+    """Times every endpoint call of a raw ccxt client as endpoint:<name>."""
+
+    def __init__(self, exchange):
+        from rate_limiter import ENDPOINT_WEIGHTS  # rate_limiter imports timed() from here
+
+        self._exchange  = exchange
+        self._endpoints = ENDPOINT_WEIGHTS
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in self._endpoints or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with timed(f"endpoint:{name}"):
+                return attr(*args, **kwargs)
+        return call
+
+# ─── SAMPLER ───────────────────────────────────────────────────────────────────
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler(threading.Thread):
+    """Folded stacks of every other thread, counted once per interval."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks   = Counter()
+        self._done    = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._done.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def top(self, n):
+        """Frames by inclusive samples (a frame counts once per stack it's on)."""
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for frame in set(stack.split(";")[1:]):
+                inclusive[frame] += count
+        return inclusive.most_common(n)
+
+# ─── CPROFILE STACKS ───────────────────────────────────────────────────────────
+def folded_stacks(stats, min_share=FOLDED_MIN):
+    """
+    Folded stacks (stack → microseconds of self time) rebuilt from a pstats
+    caller graph. cProfile only keeps direct callers, so a function's time is
+    split over the paths into it in proportion to each caller's share: exact
+    for call trees, an estimate where a function has several callers.
+    """
+    entries = stats.stats
+    callees = defaultdict(list)
+    for func, (_cc, _nc, _tt, _ct, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    roots = [func for func, entry in entries.items() if not any(c in entries for c in entry[4])]
+    floor = sum(entries[func][3] for func in roots) * min_share
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    folded = Counter()
+    # (function, stack so far, seconds spent in it along that stack), depth first
+    todo = [(func, (), entries[func][3]) for func in roots]
+    while todo:
+        func, path, seconds = todo.pop()
+        _cc, _nc, tottime, cumtime, _callers = entries[func]
+        share = seconds / cumtime if cumtime else 0.0
+        path = path + (func,)
+        if tottime * share >= floor:
+            folded[";".join(label(f) for f in path)] += int(round(tottime * share * 1e6))
+        for callee, edge_cumtime in callees.get(func, ()):
+            if callee not in path and edge_cumtime * share >= floor:
+                todo.append((callee, path, edge_cumtime * share))
+    return folded
+
+# ─── RUN ───────────────────────────────────────────────────────────────────────
+class Profile:
+    def __init__(self, name, mode):
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode {mode!r} (expected one of {MODES})")
+        self.name    = name
+        self.mode    = mode
+        self.timings = Timings()
+        self.stem    = os.path.join(PROFILE_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}")
+        self._prof   = None
+        self._sampler = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+
+    def stop(self):
+        elapsed = time.perf_counter() - self._started
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        summary = [f"{self.name}: {elapsed:.3f}s wall, mode={self.mode}", "", self.timings.report(), ""]
+
+        if self._prof is not None:
+            self._prof.disable()
+            self._prof.dump_stats(self.stem + ".prof")
+            stats = pstats.Stats(self._prof)
+            with open(self.stem + ".collapsed", "w") as f:
+                for stack, micros in sorted(folded_stacks(stats).items()):
+                    if micros:
+                        f.write(f"{stack} {micros}\n")
+            summary.append(f"Top {TOP_N} by cumulative time:")
+            for (filename, line, func), (_cc, ncalls, tottime, cumtime, _callers) in \
+                    sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_N]:
+                summary.append(f"  {cumtime:9.3f}s cum {tottime:9.3f}s self {ncalls:>8}× "
+                               f"{func} ({os.path.basename(filename)}:{line})")
+            written = f"{self.stem}.prof (+ .collapsed)"
+        else:
+            self._sampler.stop()
+            with open(self.stem + ".collapsed", "w") as f:
+                for stack, count in sorted(self._sampler.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            total = sum(self._sampler.stacks.values()) or 1
+            summary.append(f"Top {TOP_N} frames by samples ({total} samples @ {SAMPLE_INTERVAL * 1000:.0f} ms):")
+            for frame, count in self._sampler.top(TOP_N):
+                summary.append(f"  {count / total:7.1%} {count:>8}  {frame}")
+            written = self.stem + ".collapsed"
+
+        with open(self.stem + ".txt", "w") as f:
+            f.write("\n".join(summary) + "\n")
+        log.info(f"🔬 Profile written: {written} (+ {os.path.basename(self.stem)}.txt), {elapsed:.3f}s")
+
+@contextmanager
+def profile_run(name, mode=None):
+    """
+    Profile the wrapped run if `mode` (or GRIDBOT_PROFILE) names a profiler;
+    otherwise do nothing.
+    """
+    global _active
+    mode = mode or os.getenv("GRIDBOT_PROFILE")
+    if not mode or _active is not None:
+        yield
+        return
+    _active = Profile(name, mode)
+    _active.start()
+    try:
+        yield
+    finally:
+        profile, _active = _active, None
+        profile.stop()
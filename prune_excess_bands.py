@@ -2,27 +2,26 @@
 """
 prune_and_cancel_excess_bands.py
 
-For each symbol in CONFIG:
+For each symbol in gridbot.toml:
   • Fetch current price
-  • Count active bands (status != 'completed' AND buy_price < current price)
-  • If more than 1 band, cancel & delete the lowest-price excess bands
+  • Count open buy bands (status = 'waiting' AND buy_price < current price);
+    pending, partially filled and holding rows are never touched
+  • If more than the bot's allocated bands (default 1), cancel & delete the
+    lowest-price excess bands
 """
 
 import os
-import socket
-import time
 import logging
 import sqlite3
 from datetime import datetime
 
-import ccxt
 from dotenv import load_dotenv
 
-# ─── FORCE IPv4 ────────────────────────────────────────────────────────────────
-_orig_getaddrinfo = socket.getaddrinfo
-def _getaddrinfo_ipv4(host, port, family=0, type=0, proto=0, flags=0):
-    return _orig_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
-socket.getaddrinfo = _getaddrinfo_ipv4
+from grid_config import get_config
+from bootstrap import build_exchange, setup_logging
+from band_events import PRUNED, ensure_table as ensure_events_table, record
+from profiling import profile_run, profiled
+from shard_runner import symbol_dbs
 
 # ─── ENVIRONMENT ───────────────────────────────────────────────────────────────
 load_dotenv()
@@ -30,53 +29,31 @@ API_KEY    = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
 
 # ─── CONFIG ─────────────────────────────────────────────────────────────────────
-CONFIG = {
-    "ETH/USDT":  {"grid_file": "ETH-USDT-06.csv"},
-    "BTC/USDT":  {"grid_file": "BTC-USDT-05.csv"},
-    "DOGE/USDT": {"grid_file": "DOGE-USDT-10.csv"},
-    "UNI/USDT":  {"grid_file": "UNI-USDT-10.csv"},
-    "SOL/USDT":  {"grid_file": "SOL-USDT-10.csv"},
-    "XRP/USDT":  {"grid_file": "XRP-USDT-10.csv"},
-    "SHIB/USDT": {"grid_file": "SHIB-USDT-10.csv"},
-    "ADA/USDT":  {"grid_file": "ADA-USDT-06.csv"},
-    "LINK/USDT": {"grid_file": "LINK-USDT-10.csv"},
-    "DOT/USDT":  {"grid_file": "DOT-USDT-11.csv"},
-    "LTC/USDT":  {"grid_file": "LTC-USDT-08.csv"},
-    "AAVE/USDT": {"grid_file": "AAVE-USDT-12.csv"},
-    "BNB/USDT":  {"grid_file": "BNB-USDT-04.csv"},
-    "FET/USDT":  {"grid_file": "FET-USDT-10.csv"},
-    "OP/USDT":   {"grid_file": "OP-USDT-10.csv"},
-    "ARB/USDT":  {"grid_file": "ARB-USDT-06.csv"},
-    "CRV/USDT":  {"grid_file": "CRV-USDT-10.csv"},
-}
-DB_PATH = "gridbot_pairs.sqlite3"
+# Symbols come from gridbot.toml (see grid_config.py)
+# DB per symbol: GRIDBOT_DB, else the shard layout (see shard_runner.symbol_dbs)
 TABLE   = "grid_pairs"
 
 # ─── LOGGING ───────────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[
-        logging.FileHandler("prune_and_cancel.log", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# Handlers are attached in main(), not at import
 log = logging.getLogger("prune_and_cancel")
 
 # ─── EXCHANGE INIT ─────────────────────────────────────────────────────────────
-exchange = ccxt.binanceus({
-    "apiKey":          API_KEY,
-    "secret":          API_SECRET,
-    "enableRateLimit": True,
-})
-exchange.load_markets()
+# Built on first use. Shares its request budget with bot.py through the scheduler's state file.
+_exchange = None
+
+def get_exchange():
+    global _exchange
+    if _exchange is None:
+        _exchange = build_exchange("binanceus", API_KEY, API_SECRET)
+        _exchange.load_markets()
+    return _exchange
 
 # ─── PRUNE FUNCTION ────────────────────────────────────────────────────────────
-def prune_and_cancel(conn, symbol):
-    max_bands = 1  # Always keep only 1 band under current price
+@profiled("phase:prune_and_cancel")
+def prune_and_cancel(conn, symbol, max_bands=1):
 
     # 1) Fetch current market price
-    ticker = exchange.fetch_ticker(symbol)
+    ticker = get_exchange().fetch_ticker(symbol)
     price = float(ticker["last"])
     log.info(f"{symbol} ⇒ Current price: {price:.6f}")
 
@@ -86,7 +63,7 @@ def prune_and_cancel(conn, symbol):
         SELECT id, buy_order_id, buy_price
           FROM {TABLE}
          WHERE symbol = ?
-           AND status != 'completed'
+           AND status = 'waiting'
            AND buy_price < ?
          ORDER BY buy_price ASC
     """, (symbol, price))
@@ -101,36 +78,48 @@ def prune_and_cancel(conn, symbol):
         for record_id, order_id, buy_price in to_prune:
             # 3) Cancel the order on Binance
             try:
-                exchange.cancel_order(order_id, symbol)
+                cancelled = get_exchange().cancel_order(order_id, symbol)
                 log.info(f"  ⚠️ Canceled order {order_id} at buy@{buy_price:.6f}")
             except Exception as e:
-                log.error(f"  ❌ Failed to cancel {order_id}: {e}")
+                log.error(f"  ❌ Failed to cancel {order_id}, keeping the row: {e}")
+                continue
+            # Anything bought before the cancel still has to be sold: the bot's fill check takes it
+            if float((cancelled or {}).get("filled") or 0) > 0:
+                log.warning(f"  🟡 {order_id} had filled {cancelled['filled']} before the cancel, keeping the row")
+                continue
 
-            # 4) Delete the row from the database
+            # 4) Delete the row from the database (the event keeps why it went away)
+            record(conn, record_id, symbol, PRUNED, price=buy_price, order_id=order_id,
+                   detail=f"excess band, limit {max_bands}")
             cur.execute(f"DELETE FROM {TABLE} WHERE id = ?", (record_id,))
             log.info(f"  ➖ Removed DB row {record_id} (buy@{buy_price:.6f})")
 
-            # rate-limit safety
-            time.sleep(0.2)
-
         conn.commit()
-        log.info(f"  ✅ Pruned {excess} excess band(s).")
+        log.info(f"  ✅ Pruned excess band(s) down to the limit of {max_bands}.")
     else:
         log.info("  ✅ No pruning needed.")
 
 # ─── MAIN ──────────────────────────────────────────────────────────────────────
 def main():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        for sym in CONFIG.keys():
-            if sym not in exchange.symbols:
-                log.warning(f"Skipping {sym}: not on exchange")
-                continue
-            log.info(f"--- Processing {sym} ---")
-            prune_and_cancel(conn, sym)
-    finally:
-        conn.close()
-        log.info("Database connection closed.")
+    from allocation import load_band_limits  # pulls in pandas; only needed here
+
+    setup_logging("prune_and_cancel.log")
+    # GRIDBOT_PROFILE=cprofile|sample profiles the run (see profiling.py)
+    with profile_run("prune_excess_bands"):
+        for db_path, symbols in symbol_dbs(list(get_config())).items():
+            conn = sqlite3.connect(db_path)
+            ensure_events_table(conn)
+            try:
+                band_limits = load_band_limits(conn)
+                for sym in symbols:
+                    if sym not in get_exchange().symbols:
+                        log.warning(f"Skipping {sym}: not on exchange")
+                        continue
+                    log.info(f"--- Processing {sym} ({db_path}) ---")
+                    prune_and_cancel(conn, sym, band_limits.get(sym, 1))
+            finally:
+                conn.close()
+                log.info(f"Database connection closed ({db_path}).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+rate_limiter.py
+
+Shared request scheduler for exchange REST calls (Binance.US weights).
+
+  • Charges every call its documented request weight before it is sent
+  • Re-syncs the budget from the X-MBX-USED-WEIGHT-1M response header
+  • Keeps headroom for fill handling and sells by capping how much of the
+    budget seeding and cancels may use
+  • Shares one budget between processes (bot + prune scripts) through a
+    flock'ed state file, so concurrent runs use the full budget without 429s
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import ccxt
+
+from profiling import timed
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to per-process accounting only
+    fcntl = None
+
+log = logging.getLogger("rate_limiter")
+
+# ─── PRIORITIES ────────────────────────────────────────────────────────────────
+PRIORITY_FILL   = 0   # fill detection / trade reconciliation
+PRIORITY_SELL   = 1   # placing the sell leg of a filled band
+PRIORITY_SEED   = 2   # seeding new buys, price checks, balances
+PRIORITY_CANCEL = 3   # cancelling stale / excess bands
+
+# Share of the per-minute budget each priority may consume. Lower priorities
+# stop early so there is always room left for fills and sells.
+PRIORITY_CEILING = {
+    PRIORITY_FILL:   1.00,
+    PRIORITY_SELL:   1.00,
+    PRIORITY_SEED:   0.80,
+    PRIORITY_CANCEL: 0.70,
+}
+
+# ─── ENDPOINT WEIGHTS (Binance.US /api/v3) ─────────────────────────────────────
+def _tickers_weight(args, kwargs):
+    symbols = args[0] if args else kwargs.get("symbols")
+    if not symbols:
+        return 80
+    return 2 if len(symbols) <= 20 else 40 if len(symbols) <= 100 else 80
+
+def _open_orders_weight(args, kwargs):
+    symbol = args[0] if args else kwargs.get("symbol")
+    return 6 if symbol else 80
+
+ENDPOINT_WEIGHTS = {
+    "load_markets":             20,
+    "fetch_markets":            20,
+    "fetch_balance":            20,
+    "fetch_ticker":             2,
+    "fetch_tickers":            _tickers_weight,
+    "fetch_ohlcv":              2,
+    "fetch_open_orders":        _open_orders_weight,
+    "fetch_order":              4,
+    "fetch_my_trades":          20,
+    "create_order":             1,
+    "create_orders":            5,
+    "create_limit_buy_order":   1,
+    "create_limit_sell_order":  1,
+    "create_market_sell_order": 1,
+    "cancel_order":             1,
+}
+
+DEFAULT_PRIORITY = {
+    "fetch_open_orders":        PRIORITY_FILL,
+    "fetch_order":              PRIORITY_FILL,
+    "fetch_my_trades":          PRIORITY_FILL,
+    "create_limit_sell_order":  PRIORITY_SELL,
+    "create_market_sell_order": PRIORITY_SELL,
+    "cancel_order":             PRIORITY_CANCEL,
+}
+
+def endpoint_weight(name, args=(), kwargs=None):
+    weight = ENDPOINT_WEIGHTS.get(name, 1)
+    return weight(args, kwargs or {}) if callable(weight) else weight
+
+# ─── LIMITER ───────────────────────────────────────────────────────────────────
+class RateLimiter:
+    """Fixed-window weight budget shared by every process using `state_path`."""
+
+    def __init__(self, state_path, limit=1200, window=60):
+        self.state_path = state_path
+        self.limit      = limit
+        self.window     = window
+        self._lock      = threading.Lock()
+
+    @classmethod
+    def for_exchange(cls, exchange_id, **kwargs):
+        path = os.getenv("GRIDBOT_RATELIMIT_STATE", f".ratelimit-{exchange_id}.json")
+        return cls(path, **kwargs)
+
+    @contextmanager
+    def _state(self):
+        """Yield the shared state dict under an exclusive lock, then persist it."""
+        with self._lock:
+            fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.read(fd, 4096)
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+
+                now = time.time()
+                window_start = now - now % self.window
+                if state.get("window") != window_start:
+                    state = {
+                        "window":        window_start,
+                        "used":          0,
+                        "blocked_until": state.get("blocked_until", 0),
+                    }
+
+                yield state
+
+                data = json.dumps(state).encode()
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                os.close(fd)  # closing the fd releases the flock
+
+    def acquire(self, weight, priority=PRIORITY_SEED):
+        """Block until `weight` fits under the ceiling for `priority`."""
+        ceiling = self.limit * PRIORITY_CEILING.get(priority, 1.0)
+        while True:
+            with self._state() as state:
+                now = time.time()
+                wait = state["blocked_until"] - now
+                if wait <= 0:
+                    if state["used"] + weight <= ceiling:
+                        state["used"] += weight
+                        return
+                    wait = state["window"] + self.window - now
+            log.info(f"⏳ Rate budget at {state['used']}/{self.limit} (priority {priority}), waiting {wait:.2f}s")
+            time.sleep(max(wait, 0.05))
+
+    def observe(self, headers, throttled=False):
+        """Fold the exchange's view of used weight (and any ban) into the shared state."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        used = headers.get("x-mbx-used-weight-1m")
+        retry_after = headers.get("retry-after")
+        if used is None and not throttled:
+            return
+
+        with self._state() as state:
+            if used is not None:
+                state["used"] = max(state["used"], int(used))
+            if throttled:
+                backoff = float(retry_after) if retry_after else self.window
+                state["blocked_until"] = max(state["blocked_until"], time.time() + backoff)
+                log.warning(f"🚦 Exchange throttled us, pausing all requests for {backoff:.0f}s")
+
+# ─── EXCHANGE PROXY ────────────────────────────────────────────────────────────
+class ScheduledExchange:
+    """
+    Wraps a ccxt exchange so every weighted endpoint goes through a RateLimiter.
+    Anything that isn't a weighted endpoint (markets, amount_to_precision, ...)
+    is passed straight through.
+    """
+
+    def __init__(self, exchange, limiter):
+        self._exchange = exchange
+        self.limiter   = limiter
+        self._local    = threading.local()
+
+    @contextmanager
+    def priority(self, priority):
+        """Override the default priority of every call made inside the block."""
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield self
+        finally:
+            self._local.priority = previous
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in ENDPOINT_WEIGHTS or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            priority = getattr(self._local, "priority", None)
+            if priority is None:
+                priority = DEFAULT_PRIORITY.get(name, PRIORITY_SEED)
+            with timed("ratelimit:wait"):
+                self.limiter.acquire(endpoint_weight(name, args, kwargs), priority)
+            try:
+                result = attr(*args, **kwargs)
+            except (ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+                self.limiter.observe(self._exchange.last_response_headers, throttled=True)
+                raise
+            self.limiter.observe(self._exchange.last_response_headers)
+            return result
+
+        return call
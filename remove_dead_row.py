@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import sqlite3
 
+from band_events import REMOVED, ensure_table as ensure_events_table, record_many
+
 def delete_bnb_ready_to_sell():
     db_path = "gridbot_pairs.sqlite3"
     conn = sqlite3.connect(db_path)
@@ -17,6 +19,15 @@ def delete_bnb_ready_to_sell():
     if count > 0:
         confirm = input("Delete these rows? Type 'yes' to confirm: ")
         if confirm.strip().lower() == 'yes':
+            ensure_events_table(conn)
+            cursor.execute("""
+                SELECT id, symbol, buy_price, buy_amount, buy_order_id FROM grid_pairs
+                 WHERE symbol = 'BTC/USDT' AND status = 'ready_to_sell'
+            """)
+            record_many(conn, [
+                (pair_id, sym, REMOVED, buy_price, amount, order_id, "remove_dead_row: stuck ready_to_sell")
+                for pair_id, sym, buy_price, amount, order_id in cursor.fetchall()
+            ])
             cursor.execute("""
                 DELETE FROM grid_pairs
                  WHERE symbol = 'BTC/USDT' AND status = 'ready_to_sell'
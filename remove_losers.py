@@ -2,8 +2,9 @@
 """
 cancel_and_prune_buys.py
 
-This script connects to Binance via CCXT and your `gridbot_pairs.sqlite3` database,
-then for ETH/USDT and BTC/USDT:
+This script connects to Binance via CCXT and the bot's database (GRIDBOT_DB, or
+each symbol's shard from shard_layout.json - see shard_runner.symbol_dbs),
+then for every symbol in gridbot.toml:
   1. Fetches all open BUY orders on Binance.
   2. Cancels each buy order on Binance.
   3. Deletes corresponding rows in the `grid_pairs` database table.
@@ -14,20 +15,17 @@ Usage:
 """
 
 import os
-import socket
 import logging
 import sqlite3
-import time
 from datetime import datetime
 
-import ccxt
 from dotenv import load_dotenv
 
-# ─── FORCE IPv4 ────────────────────────────────────────────────────────────────
-_orig_getaddrinfo = socket.getaddrinfo
-def _getaddrinfo_ipv4(host, port, family=0, type=0, proto=0, flags=0):
-    return _orig_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
-socket.getaddrinfo = _getaddrinfo_ipv4
+from grid_config import get_config
+from bootstrap import build_exchange, setup_logging
+from band_events import REMOVED, ensure_table as ensure_events_table, record
+from profiling import profile_run, profiled
+from shard_runner import symbol_dbs
 
 # ─── ENVIRONMENT ───────────────────────────────────────────────────────────────
 load_dotenv()
@@ -35,34 +33,31 @@ API_KEY    = os.getenv("BINANCE_API_KEY")
 API_SECRET = os.getenv("BINANCE_API_SECRET")
 
 # ─── CONFIG ─────────────────────────────────────────────────────────────────────
-SYMBOLS = ["ETH/USDT", "BTC/USDT","DOGE/USDT","UNI/USDT","SOL/USDT","XRP/USDT","SHIB/USDT","ADA/USDT","LINK/USDT","DOT/USDT","LTC/USDT","AAVE/USDT","BNB/USDT","FET/USDT","OP/USDT","ARB/USDT","CRV/USDT"]
-DB_PATH = "gridbot_pairs.sqlite3"
+# Symbols come from gridbot.toml (see grid_config.py)
+# DB per symbol: GRIDBOT_DB, else the shard layout (see shard_runner.symbol_dbs)
 TABLE   = "grid_pairs"
 
 # ─── LOGGING ───────────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[
-        logging.FileHandler("cancel_and_prune_buys.log", encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# Handlers are attached in main(), not at import
 log = logging.getLogger("cancel_and_prune_buys")
 
 # ─── EXCHANGE INIT ─────────────────────────────────────────────────────────────
-exchange = ccxt.binanceus({
-    "apiKey":          API_KEY,
-    "secret":          API_SECRET,
-    "enableRateLimit": True,
-})
-exchange.load_markets()
+# Built on first use. Shares its request budget with bot.py through the scheduler's state file.
+_exchange = None
 
+def get_exchange():
+    global _exchange
+    if _exchange is None:
+        _exchange = build_exchange("binanceus", API_KEY, API_SECRET)
+        _exchange.load_markets()
+    return _exchange
+
+@profiled("phase:cancel_and_delete")
 def cancel_and_delete(symbol, conn):
     log.info(f"--- Processing {symbol} ---")
     # 1) Fetch open orders
     try:
-        open_orders = exchange.fetch_open_orders(symbol)
+        open_orders = get_exchange().fetch_open_orders(symbol)
     except Exception as e:
         log.error(f"Failed to fetch open orders for {symbol}: {e}")
         return
@@ -78,34 +73,47 @@ def cancel_and_delete(symbol, conn):
         amount = order.get("amount")
         # 2) Cancel on Binance
         try:
-            exchange.cancel_order(oid, symbol)
+            cancelled = get_exchange().cancel_order(oid, symbol)
             log.info(f"  ⚠️ Canceled Binance BUY order {oid} @ {price} qty={amount}")
         except Exception as e:
-            log.error(f"  ❌ Failed to cancel order {oid}: {e}")
-        # 3) Delete from database
+            log.error(f"  ❌ Failed to cancel order {oid}, keeping its row: {e}")
+            continue
+        # What filled before the cancel still has to be sold: leave it to the bot's fill check
+        filled = float((cancelled or {}).get("filled") or order.get("filled") or 0)
+        if filled > 0:
+            log.warning(f"  🟡 {oid} had filled {filled} before the cancel, keeping its row")
+            continue
+        # 3) Delete from database (the event keeps why it went away)
+        for (pair_id,) in cur.execute(
+            f"SELECT id FROM {TABLE} WHERE symbol=? AND buy_order_id=?", (symbol, oid)
+        ).fetchall():
+            record(conn, pair_id, symbol, REMOVED, price=price, amount=amount, order_id=oid,
+                   detail="open buy cancelled by remove_losers")
         cur.execute(
             f"DELETE FROM {TABLE} WHERE symbol=? AND buy_order_id=?",
             (symbol, oid)
         )
         log.info(f"  ➖ Deleted DB row for buy_order_id={oid}")
-        # Rate-limit safety
-        time.sleep(0.2)
 
     conn.commit()
     log.info(f"{symbol}: Cancellation and pruning complete.\n")
 
 def main():
-    # Connect to DB
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        for sym in SYMBOLS:
-            if sym not in exchange.symbols:
-                log.warning(f"Skipping {sym}: not listed on exchange")
-                continue
-            cancel_and_delete(sym, conn)
-    finally:
-        conn.close()
-        log.info("Database connection closed.")
+    setup_logging("cancel_and_prune_buys.log")
+    # GRIDBOT_PROFILE=cprofile|sample profiles the run (see profiling.py)
+    with profile_run("remove_losers"):
+        for db_path, symbols in symbol_dbs(list(get_config())).items():
+            conn = sqlite3.connect(db_path)
+            ensure_events_table(conn)
+            try:
+                for sym in symbols:
+                    if sym not in get_exchange().symbols:
+                        log.warning(f"Skipping {sym}: not listed on exchange")
+                        continue
+                    cancel_and_delete(sym, conn)
+            finally:
+                conn.close()
+                log.info(f"Database connection closed ({db_path}).")
 
 if __name__ == "__main__":
     main()
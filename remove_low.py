@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import sqlite3
 
+from band_events import REMOVED, ensure_table as ensure_events_table, record_many
+
 # ─── CONFIG ─────────────────────────────────────────────────────────────────────
 DB_PATH = "gridbot_pairs.sqlite3"
 
@@ -19,7 +21,16 @@ def remove_sol_orders(db_path, symbol="SOL/USDT", price_threshold=129):
     )
     count = cursor.fetchone()[0]
     print(f"🔴 Deleting {count} row(s) where symbol = '{symbol}' and buy_price < {price_threshold}")
-    # Perform deletion
+    # Record why each band went away, then delete
+    ensure_events_table(conn)
+    cursor.execute(
+        "SELECT id, buy_price, buy_amount, buy_order_id FROM grid_pairs WHERE symbol = ? AND buy_price < ?",
+        (symbol, price_threshold)
+    )
+    record_many(conn, [
+        (pair_id, symbol, REMOVED, buy_price, amount, order_id, f"remove_low: buy_price < {price_threshold}")
+        for pair_id, buy_price, amount, order_id in cursor.fetchall()
+    ])
     cursor.execute(
         "DELETE FROM grid_pairs WHERE symbol = ? AND buy_price < ?",
         (symbol, price_threshold)
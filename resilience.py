@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+resilience.py
+
+Retry policy and circuit breakers around exchange calls.
+
+  • Errors are classified: network trouble, timeouts and throttling are
+    retryable; anything the exchange rejected on its merits (bad order,
+    insufficient funds, unknown order, auth) is not
+  • Retryable failures back off exponentially with full jitter
+  • Order-creating calls are never retried blindly - a timeout may still have
+    placed the order; the order journal resolves those by client id
+  • Each endpoint has a circuit breaker: after repeated retryable failures it
+    opens and fails fast (no network, no rate budget) until a cool-down passes,
+    then lets a single probe through
+"""
+
+import time
+import random
+import logging
+import threading
+
+import ccxt
+
+from rate_limiter import ENDPOINT_WEIGHTS
+
+log = logging.getLogger("resilience")
+
+# Calls that are unsafe to repeat without first checking what happened
+NON_IDEMPOTENT = {
+    "create_order",
+    "create_orders",
+    "create_limit_buy_order",
+    "create_limit_sell_order",
+    "create_market_sell_order",
+}
+
+class CircuitOpenError(ccxt.ExchangeError):
+    """Raised without touching the network while an endpoint's breaker is open."""
+
+def is_retryable(e):
+    return isinstance(e, ccxt.NetworkError)
+
+# ─── POLICY ────────────────────────────────────────────────────────────────────
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay   = base_delay
+        self.max_delay    = max_delay
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+    """closed → open after `threshold` consecutive failures → half-open after `cooldown`."""
+
+    def __init__(self, name, threshold=5, cooldown=30.0):
+        self.name      = name
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self.failures  = 0
+        self.opened_at = None
+        self._lock     = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError(f"{self.name}: circuit open after {self.failures} failures")
+            # half-open: let this call probe; a failure re-opens immediately
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                log.warning(f"🔌 Circuit OPEN for {self.name} ({self.failures} consecutive failures), "
+                            f"cooling down {self.cooldown:.0f}s")
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+# ─── EXCHANGE PROXY ────────────────────────────────────────────────────────────
+class ResilientExchange:
+    """
+    Wraps an exchange (usually a ScheduledExchange) so every endpoint call goes
+    through its circuit breaker and the retry policy. Other attributes pass
+    straight through.
+    """
+
+    def __init__(self, exchange, policy=None, threshold=5, cooldown=30.0):
+        self._exchange = exchange
+        self.policy    = policy or RetryPolicy()
+        self._breakers = {name: CircuitBreaker(name, threshold, cooldown) for name in ENDPOINT_WEIGHTS}
+
+    def breaker(self, name):
+        return self._breakers[name]
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in self._breakers or not callable(attr):
+            return attr
+
+        breaker = self._breakers[name]
+        attempts = 1 if name in NON_IDEMPOTENT else self.policy.max_attempts
+
+        def call(*args, **kwargs):
+            for attempt in range(attempts):
+                breaker.before_call()
+                try:
+                    result = attr(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # the endpoint answered; it just said no
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    if attempt + 1 >= attempts or breaker.is_open:
+                        raise
+                    wait = self.policy.delay(attempt)
+                    log.warning(f"🔁 {name} failed ({type(e).__name__}: {e}), retry {attempt + 1}/{attempts - 1} in {wait:.2f}s")
+                    time.sleep(wait)
+                else:
+                    breaker.record_success()
+                    return result
+
+        return call
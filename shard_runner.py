@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+shard_runner.py
+
+Runs bot.py's cycle for many symbols across worker processes.
+
+  • Symbols are split over the shards of every configured account. A new
+    symbol goes where its rows already are (any gridbot_pairs*.sqlite3), else
+    by stable hashing; the placement is saved to shard_layout.json and reused,
+    so changing --shards never strands a symbol's rows, intents and live
+    orders in a DB its worker no longer opens. Only new symbols use new shards
+  • prune_excess_bands.py / remove_losers.py find each symbol's DB through
+    the same layout (symbol_dbs)
+  • Symbols taken out of gridbot.toml that still have open rows wind down in
+    the DB that holds them (no new buys; fills and sells carry on), with a
+    worker of their own if no configured symbol is left there
+  • Each worker gets its own exchange client, API keys, DB shard and log file;
+    workers on the same exchange share that exchange's rate budget through
+    the scheduler state file, different exchanges get separate budgets
+  • The coordinator fetches each account's balance once and hands it to that
+    account's workers, so sizing matches update_config_with_dynamic_usdt
+    (percent of the account's free USDT per symbol) however it is sharded
+
+Usage:
+  ./shard_runner.py                       # one cycle, all symbols, ACCOUNTS below
+  ./shard_runner.py --shards 4            # 4 workers per account
+  ./shard_runner.py --interval 300        # repeat every 5 minutes
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import argparse
+import multiprocessing as mp
+
+from dotenv import load_dotenv
+
+from grid_config import get_config
+from bootstrap import build_exchange, setup_logging
+
+# ─── CONFIG ─────────────────────────────────────────────────────────────────────
+# One entry per API account. Keys are read from the named environment variables.
+ACCOUNTS = {
+    "main": {
+        "exchange":   "binanceus",
+        "key_env":    "BINANCE_API_KEY",
+        "secret_env": "BINANCE_API_SECRET",
+    },
+    # "alt": {
+    #     "exchange":   "binanceus",
+    #     "key_env":    "BINANCE_API_KEY_ALT",
+    #     "secret_env": "BINANCE_API_SECRET_ALT",
+    # },
+}
+
+# ─── LOGGING ───────────────────────────────────────────────────────────────────
+# Configured in main() only: spawned workers re-import this module and must
+# leave the root logger to bot.py (per-shard log file).
+log = logging.getLogger("shard_runner")
+
+# ─── SHARDING ──────────────────────────────────────────────────────────────────
+LAYOUT_PATH = os.getenv("GRIDBOT_SHARD_LAYOUT", "shard_layout.json")
+DEFAULT_DB  = "gridbot_pairs.sqlite3"
+
+def shard_name(account, shard, shards_per_account):
+    # A single-shard, single-account setup keeps the original file names
+    if len(ACCOUNTS) == 1 and shards_per_account == 1:
+        return None
+    return f"{account}.{shard}"
+
+def db_path(name):
+    return DEFAULT_DB if name is None else f"gridbot_pairs.{name}.sqlite3"
+
+def load_layout(path=LAYOUT_PATH):
+    """{symbol: (account, shard name)} as placed by earlier runs."""
+    try:
+        with open(path) as f:
+            return {sym: tuple(slot) for sym, slot in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+def save_layout(layout, path=LAYOUT_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({sym: list(slot) for sym, slot in sorted(layout.items())}, f, indent=2)
+    os.replace(tmp, path)
+
+def db_slot(path):
+    """(account, shard name) of a DB file, the inverse of db_path()."""
+    base = os.path.basename(path)
+    name = None if base == DEFAULT_DB else base[len("gridbot_pairs."):-len(".sqlite3")]
+    return (name.split(".")[0] if name else sorted(ACCOUNTS)[0]), name
+
+def row_counts():
+    """{db path: [(symbol, open rows, rows), ...]} for every DB file; unreadable files are skipped."""
+    counts = {}
+    for path in sorted(glob.glob("gridbot_pairs*.sqlite3")):
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                counts[path] = conn.execute("""
+                    SELECT symbol, SUM(status NOT IN ('completed', 'dust')), COUNT(*) FROM grid_pairs GROUP BY symbol
+                """).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            log.warning(f"⚠️ Could not read {path} for shard placement: {e}")
+    return counts
+
+def existing_placement():
+    """
+    {symbol: (account, shard name)} for symbols that already have rows in a DB
+    file - the one with the most open rows, then the most rows.
+    """
+    best = {}
+    for path, rows in row_counts().items():
+        for sym, active, total in rows:
+            if sym not in best or (active, total) > best[sym][0]:
+                best[sym] = ((active, total), db_slot(path))
+    return {sym: slot for sym, (_, slot) in best.items()}
+
+def winding_down(symbols):
+    """
+    {db path: [symbols]} for symbols not in `symbols` that still have open rows
+    (removed from gridbot.toml or disabled): their fills and sells carry on.
+    """
+    configured = set(symbols)
+    found = {}
+    for path, rows in row_counts().items():
+        for sym, active, _ in rows:
+            if active and sym not in configured:
+                found.setdefault(path, []).append(sym)
+    return found
+
+def assign_shards(symbols, shards_per_account, layout=None):
+    """
+    {(account, shard name): [symbols]}. Symbols keep the slot `layout` (default:
+    the saved one) gives them; new ones go where their rows are, else to a
+    crc32-picked slot. The updated layout is saved.
+    """
+    saved = load_layout() if layout is None else layout
+    layout = dict(saved)
+    slots = [(acct, shard_name(acct, i, shards_per_account))
+             for acct in sorted(ACCOUNTS) for i in range(shards_per_account)]
+    found = None
+    assignment = {}
+    for sym in symbols:
+        slot = layout.get(sym)
+        if slot is None or slot[0] not in ACCOUNTS:
+            if found is None:
+                found = existing_placement()
+            slot = found.get(sym) or slots[zlib.crc32(sym.encode()) % len(slots)]
+            layout[sym] = slot
+        elif slot not in slots:
+            log.info(f"📌 {sym} stays on {db_path(slot[1])} (its rows live there)")
+        assignment.setdefault(tuple(slot), []).append(sym)
+    if layout != saved:
+        save_layout(layout)
+    return assignment
+
+def symbol_dbs(symbols):
+    """
+    {db path: [symbols]}: where each symbol's rows live, for the maintenance
+    scripts, plus the winding-down symbols each DB still has open rows for.
+    GRIDBOT_DB pins everything to one file, as it does for bot.py.
+    """
+    symbols = list(symbols)
+    if os.getenv("GRIDBOT_DB"):
+        pinned = os.environ["GRIDBOT_DB"]
+        extra = _open_symbols(pinned)
+        return {pinned: symbols + sorted(set(extra) - set(symbols))}
+    layout = load_layout()
+    dbs = {}
+    for sym in symbols:
+        dbs.setdefault(db_path(layout[sym][1]) if sym in layout else DEFAULT_DB, []).append(sym)
+    for path, syms in winding_down(symbols).items():
+        dbs.setdefault(path, []).extend(syms)
+    return dbs
+
+def _open_symbols(path):
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return [sym for (sym,) in conn.execute("""
+                SELECT DISTINCT symbol FROM grid_pairs WHERE status NOT IN ('completed', 'dust')
+            """)]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+
+def worker_env(account, name):
+    acct = ACCOUNTS[account]
+    env = {
+        "GRIDBOT_EXCHANGE":   acct["exchange"],
+        "BINANCE_API_KEY":    os.getenv(acct["key_env"], ""),
+        "BINANCE_API_SECRET": os.getenv(acct["secret_env"], ""),
+    }
+    if name:
+        env["GRIDBOT_DB"]  = db_path(name)
+        env["GRIDBOT_LOG"] = f"gridbot.{name}.log"
+    return env
+
+# ─── BALANCES ──────────────────────────────────────────────────────────────────
+def fetch_account_balances():
+    """Free USDT per account, one fetch_balance each."""
+    balances = {}
+    for account, acct in ACCOUNTS.items():
+        try:
+            exchange = build_exchange(acct["exchange"], os.getenv(acct["key_env"]), os.getenv(acct["secret_env"]))
+            balances[account] = float(exchange.fetch_balance()["USDT"]["free"])
+        except Exception as e:
+            log.error(f"❌ {account}: failed to fetch balance: {e}")
+            balances[account] = None
+    total = sum(b for b in balances.values() if b is not None)
+    log.info(f"💰 Free USDT across {len(balances)} account(s): {total:.4f} {balances}")
+    return balances
+
+# ─── WORKER ────────────────────────────────────────────────────────────────────
+def _worker(env, symbols, usdt_balance):
+    # bot.py reads its exchange/DB/log settings at import, so set them first
+    os.environ.update(env)
+    import bot
+    setup_logging(bot.LOG_PATH)
+    try:
+        bot.run_cycle(symbols, usdt_balance=usdt_balance)
+    finally:
+        bot.close_db()
+
+def run_once(shards_per_account):
+    assignment = assign_shards(list(get_config()), shards_per_account)
+    # A DB left with only winding-down symbols still needs a worker for their fills and sells
+    for path in winding_down(get_config()):
+        assignment.setdefault(db_slot(path), [])
+    balances = fetch_account_balances()
+
+    ctx = mp.get_context("spawn")
+    procs = []
+    for (account, name), symbols in sorted(assignment.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+        if balances.get(account) is None:
+            log.warning(f"Skipping {db_path(name)}: no balance for {account}")
+            continue
+        p = ctx.Process(
+            target=_worker,
+            args=(worker_env(account, name), symbols, balances[account]),
+            name=f"gridbot-{name or account}",
+        )
+        p.start()
+        log.info(f"▶️ {p.name} (pid {p.pid}): {', '.join(symbols) or 'winding down only'}")
+        procs.append(p)
+
+    failed = 0
+    for p in procs:
+        p.join()
+        if p.exitcode != 0:
+            failed += 1
+            log.error(f"❌ {p.name} exited with {p.exitcode}")
+    log.info(f"=== Sharded run finished: {len(procs) - failed}/{len(procs)} workers OK ===")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the grid bot across worker processes.")
+    parser.add_argument("--shards", type=int, default=1, help="worker processes per account")
+    parser.add_argument("--interval", type=float, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    setup_logging("shard_runner.log")
+    load_dotenv()
+    while True:
+        failed = run_once(max(args.shards, 1))
+        if not args.interval:
+            sys.exit(1 if failed else 0)
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
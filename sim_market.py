@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+sim_market.py
+
+A local simulated market for running the bot offline (see soak.py).
+
+  • Prices follow a driftless log random walk per symbol, stepped every
+    SUBSTEP simulated seconds, starting mid-grid
+  • Resting limit orders fill when the walk touches them, sometimes only in
+    part; market sells fill at once. Trades carry the exchange's fee shape
+    (buys pay in base, sells in quote)
+  • Now and then an order is expired by the exchange, or a call fails with a
+    network error - some of them after an order was already placed - so the
+    retry layer, intent recovery and cancel paths all get exercised
+  • Time is simulated: advance() moves the market's `now`, which soak.py
+    installs as the bot's clock (clock.set_source)
+
+SimulatedExchange stands in for the raw ccxt client (bootstrap.build_exchange
+uses it while a market is installed), so the scheduler, retry layer and
+profiler run as they would live. Precision helpers come from an offline ccxt
+instance loaded with the simulated markets.
+"""
+
+import math
+import random
+import logging
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+log = logging.getLogger("sim_market")
+
+# ─── DEFAULTS ──────────────────────────────────────────────────────────────────
+SUBSTEP         = 10.0      # simulated seconds between price steps
+DAILY_VOL       = 0.04      # log-price stdev per simulated day
+FEE_RATE        = 0.001
+PARTIAL_FILL    = 0.2       # chance a touched order only half-fills
+EXPIRE_RATE     = 0.0002    # per open order per advance()
+ERROR_RATE      = 0.001     # per endpoint call
+START_BALANCE   = 10_000.0  # USDT
+RETAIN_SECONDS  = 3 * 86400 # closed orders and trades older than this are forgotten
+TRADES_PAGE     = 500       # fetch_my_trades page size, as on Binance
+
+active_market = None   # the SimulatedMarket the next build_exchange() will trade on
+
+# ─── MARKET ────────────────────────────────────────────────────────────────────
+class SimulatedMarket:
+    """Order book state and price paths for `prices` ({symbol: starting price})."""
+
+    def __init__(self, prices, start=None, seed=0, daily_vol=DAILY_VOL,
+                 error_rate=ERROR_RATE, expire_rate=EXPIRE_RATE, quote="USDT"):
+        self.now         = datetime.now(timezone.utc).timestamp() if start is None else start
+        self.rng         = random.Random(seed)
+        self.daily_vol   = daily_vol
+        self.error_rate  = error_rate
+        self.expire_rate = expire_rate
+        self.quote       = quote
+        self.prices      = dict(prices)
+        self.ranges      = {sym: deque() for sym in prices}   # (t, low, high) per advance, 24h
+        self.balances    = defaultdict(float, {quote: START_BALANCE})
+        self.orders      = {}                                  # id → ccxt-shaped order
+        self.by_cid      = {}
+        self.open        = defaultdict(dict)                   # symbol → {id: order}
+        self.trades      = defaultdict(deque)                  # symbol → trades, oldest first
+        self.calls       = 0
+        self.errors      = 0
+        self._next_id    = 1
+        self._lock       = threading.RLock()
+
+    # ── markets ──
+    def markets(self):
+        out = {}
+        for sym, price in self.prices.items():
+            base, quote = sym.split("/")
+            step = min(10.0 ** math.floor(math.log10(0.01 / price)), 1.0)
+            out[sym] = {
+                "id": base + quote, "symbol": sym, "base": base, "quote": quote,
+                "baseId": base, "quoteId": quote, "type": "spot", "spot": True, "active": True,
+                "precision": {"amount": step, "price": 1e-8},
+                "limits": {"amount": {"min": step, "max": None}, "price": {"min": 1e-8, "max": None},
+                           "cost": {"min": 1.0, "max": None}},
+            }
+        return out
+
+    # ── time ──
+    def advance(self, seconds):
+        """Move every price path `seconds` forward, filling whatever it touches."""
+        with self._lock:
+            steps = max(int(seconds / SUBSTEP), 1)
+            sigma = self.daily_vol * math.sqrt(seconds / steps / 86400.0)
+            for sym in self.prices:
+                low = high = self.prices[sym]
+                for _ in range(steps):
+                    self.prices[sym] *= math.exp(self.rng.gauss(0.0, sigma))
+                    low, high = min(low, self.prices[sym]), max(high, self.prices[sym])
+                    self._match(sym, self.prices[sym])
+                self.ranges[sym].append((self.now + seconds, low, high))
+            self.now += seconds
+            self._expire()
+            self._forget()
+
+    def _match(self, sym, price):
+        for o in list(self.open[sym].values()):
+            if (o["side"] == "buy" and price <= o["price"]) or (o["side"] == "sell" and price >= o["price"]):
+                part = o["remaining"] / 2 if self.rng.random() < PARTIAL_FILL and not o["filled"] else o["remaining"]
+                self._fill(o, part, o["price"])
+
+    def _fill(self, o, amount, price):
+        base, quote = o["symbol"].split("/")
+        cost = amount * price
+        if o["side"] == "buy":
+            fee = {"currency": base, "cost": amount * FEE_RATE}
+            self.balances[base] += amount - fee["cost"]
+        else:
+            fee = {"currency": quote, "cost": cost * FEE_RATE}
+            self.balances[quote] += cost - fee["cost"]
+        self.trades[o["symbol"]].append({
+            "id": str(self._next_id), "order": o["id"], "symbol": o["symbol"], "side": o["side"],
+            "price": price, "amount": amount, "cost": cost, "fee": fee, "fees": [fee],
+            "timestamp": int(self.now * 1000), "datetime": None, "takerOrMaker": "maker",
+        })
+        self._next_id += 1
+        o["filled"] += amount
+        o["remaining"] = max(o["amount"] - o["filled"], 0.0)
+        o["cost"] += cost
+        o["average"] = o["cost"] / o["filled"]
+        if o["remaining"] <= 1e-12:
+            self._close(o, "closed")
+
+    def _close(self, o, status):
+        o["status"] = status
+        o["lastUpdateTimestamp"] = int(self.now * 1000)
+        self.open[o["symbol"]].pop(o["id"], None)
+        # release whatever was still reserved for the order
+        if o["side"] == "buy":
+            self.balances[self.quote] += o["remaining"] * o["price"]
+        else:
+            self.balances[o["symbol"].split("/")[0]] += o["remaining"]
+
+    def _expire(self):
+        for book in self.open.values():
+            for o in list(book.values()):
+                if self.rng.random() < self.expire_rate:
+                    self._close(o, "expired")
+
+    def _forget(self):
+        cutoff = self.now - RETAIN_SECONDS
+        for sym, trades in self.trades.items():
+            while trades and trades[0]["timestamp"] < cutoff * 1000:
+                trades.popleft()
+        for sym, ranges in self.ranges.items():
+            while ranges and ranges[0][0] < self.now - 86400:
+                ranges.popleft()
+        stale = [oid for oid, o in self.orders.items()
+                 if o["status"] != "open" and o["lastUpdateTimestamp"] < cutoff * 1000]
+        for oid in stale:
+            self.by_cid.pop(self.orders.pop(oid)["clientOrderId"], None)
+
+    # ── orders ──
+    def place(self, sym, side, type_, amount, price, cid):
+        import ccxt
+
+        with self._lock:
+            if cid in self.by_cid:
+                raise ccxt.InvalidOrder(f"Duplicate order sent (clientOrderId {cid})")
+            base = sym.split("/")[0]
+            if side == "buy":
+                if amount * price > self.balances[self.quote]:
+                    raise ccxt.InsufficientFunds(f"Account has insufficient balance for {sym} buy")
+                self.balances[self.quote] -= amount * price
+            else:
+                self.balances[base] -= amount
+            o = {
+                "id": str(self._next_id), "clientOrderId": cid, "symbol": sym, "type": type_,
+                "side": side, "price": price, "amount": amount, "filled": 0.0, "remaining": amount,
+                "cost": 0.0, "average": None, "status": "open", "fee": None, "trades": [],
+                "timestamp": int(self.now * 1000), "lastUpdateTimestamp": int(self.now * 1000),
+            }
+            self._next_id += 1
+            self.orders[o["id"]] = o
+            if cid:
+                self.by_cid[cid] = o
+            self.open[sym][o["id"]] = o
+            if type_ == "market":
+                self._fill(o, amount, self.prices[sym] * (1 - 0.0005))
+            return dict(o)
+
+    def cancel(self, order_id, sym):
+        import ccxt
+
+        with self._lock:
+            o = self.open[sym].get(order_id)
+            if o is None:
+                raise ccxt.OrderNotFound(f"Unknown order sent ({order_id})")
+            self._close(o, "canceled")
+            return dict(o)
+
+    def ticker(self, sym):
+        with self._lock:
+            price = self.prices[sym]
+            ranges = self.ranges[sym]
+            low  = min((lo for _, lo, _ in ranges), default=price)
+            high = max((hi for _, _, hi in ranges), default=price)
+            return {"symbol": sym, "last": price, "bid": price, "ask": price, "close": price,
+                    "high": high, "low": low, "timestamp": int(self.now * 1000)}
+
+    def retained(self):
+        """(orders, trades) the simulator is holding - its own share of the process's memory."""
+        with self._lock:
+            return len(self.orders), sum(len(t) for t in self.trades.values())
+
+# ─── CLIENT ────────────────────────────────────────────────────────────────────
+class SimulatedExchange:
+    """Raw ccxt client stand-in answering every endpoint from a SimulatedMarket."""
+
+    def __init__(self, market, exchange):
+        from rate_limiter import ENDPOINT_WEIGHTS
+
+        self._market    = market
+        self._exchange  = exchange
+        self._endpoints = ENDPOINT_WEIGHTS
+        self.last_response_headers = {}
+        exchange.set_markets(market.markets())
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if name not in self._endpoints or not callable(attr):
+            return attr
+        handler = getattr(self, "_" + name)
+
+        def call(*args, **kwargs):
+            import ccxt
+
+            market = self._market
+            with market._lock:
+                market.calls += 1
+                fail = market.rng.random() < market.error_rate
+                after = fail and name.startswith("create_") and market.rng.random() < 0.5
+            if fail and not after:
+                market.errors += 1
+                raise ccxt.NetworkError(f"simulated network error in {name}")
+            result = handler(*args, **kwargs)
+            if after:
+                market.errors += 1
+                raise ccxt.RequestTimeout(f"simulated timeout after {name} reached the exchange")
+            return result
+        return call
+
+    # ── endpoints ──
+    def _load_markets(self, reload=False, params=None):
+        return self._exchange.markets
+
+    def _fetch_markets(self, params=None):
+        return list(self._exchange.markets.values())
+
+    def _fetch_balance(self, params=None):
+        with self._market._lock:
+            return {ccy: {"free": amount, "used": 0.0, "total": amount}
+                    for ccy, amount in self._market.balances.items()}
+
+    def _fetch_ticker(self, symbol, params=None):
+        return self._market.ticker(symbol)
+
+    def _fetch_tickers(self, symbols=None, params=None):
+        return {sym: self._market.ticker(sym) for sym in (symbols or self._market.prices)}
+
+    def _fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        with self._market._lock:
+            return [dict(o) for o in self._market.open[symbol].values()]
+
+    def _fetch_order(self, id, symbol=None, params=None):
+        import ccxt
+
+        with self._market._lock:
+            o = self._market.orders.get(id) if id else self._market.by_cid.get((params or {}).get("origClientOrderId"))
+            if o is None:
+                raise ccxt.OrderNotFound(f"Order does not exist ({id})")
+            return dict(o)
+
+    def _fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        with self._market._lock:
+            trades = self._market.trades[symbol]
+            order_id = (params or {}).get("orderId")
+            if order_id:
+                return [dict(t) for t in trades if t["order"] == order_id]
+            if since is None:
+                return [dict(t) for t in list(trades)[-TRADES_PAGE:]]
+            return [dict(t) for t in trades if t["timestamp"] >= since][:TRADES_PAGE]
+
+    def _create_order(self, symbol, type, side, amount, price=None, params=None):
+        amount = float(self._exchange.amount_to_precision(symbol, amount))
+        if type == "limit":
+            price = float(self._exchange.price_to_precision(symbol, price))
+        else:
+            price = self._market.prices[symbol]
+        return self._market.place(symbol, side, type, amount, price, (params or {}).get("newClientOrderId"))
+
+    def _create_orders(self, orders, params=None):
+        return [self._create_order(o["symbol"], o["type"], o["side"], o["amount"], o.get("price"), o.get("params"))
+                for o in orders]
+
+    def _create_limit_buy_order(self, symbol, amount, price, params=None):
+        return self._create_order(symbol, "limit", "buy", amount, price, params)
+
+    def _create_limit_sell_order(self, symbol, amount, price, params=None):
+        return self._create_order(symbol, "limit", "sell", amount, price, params)
+
+    def _create_market_sell_order(self, symbol, amount, params=None):
+        return self._create_order(symbol, "market", "sell", amount, None, params)
+
+    def _cancel_order(self, id, symbol=None, params=None):
+        return self._market.cancel(id, symbol)
+
+    def _fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        t = self._market.ticker(symbol)
+        return [[t["timestamp"], t["last"], t["high"], t["low"], t["last"], 0.0]]
+
+# ─── HOOK ──────────────────────────────────────────────────────────────────────
+def is_simulating():
+    return active_market is not None
+
+def simulated_client(exchange):
+    """`exchange` (an offline ccxt instance) trading on the installed market."""
+    return SimulatedExchange(active_market, exchange)
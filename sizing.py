@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+sizing.py
+
+Order quantities the exchange accepts as sent, and that round-trip: each buy
+is sized so what it nets after the fee covers a sell of whole lots, which is
+known (and checked against the minimums) before the buy is placed.
+
+  • MarketRules     – lot step, minimum amount, minimum notional and maker fee
+                      of one market, precomputed once from the loaded markets
+  • size_bands()    – buy and sell quantities for many bands in one numpy pass
+  • sell_quantity() – the sellable part of a filled buy's net amount
+Bands that can't meet the market's minimums within usd_per_order come back
+with quantity 0 (and the USD they would need) instead of being sent and
+rejected.
+
+Buy fees are assumed to come out of the base currency (Binance's default).
+That fee is rarely a whole lot, so up to one lot of each buy stays behind -
+the least any quantity can leave. When fees are paid in BNB instead, the buy
+nets the whole quantity, which is already a whole number of lots.
+"""
+
+import math
+from decimal import Decimal
+
+import numpy as np
+
+FEE_RATE = 0.001        # when the market doesn't list a maker fee
+EPS      = 1e-9         # slack for float noise in lot counts
+
+# ─── RULES ─────────────────────────────────────────────────────────────────────
+class MarketRules:
+    def __init__(self, symbol, step, min_amount=0.0, min_cost=0.0, fee=FEE_RATE):
+        self.symbol     = symbol
+        self.step       = step
+        self.min_amount = min_amount or 0.0
+        self.min_cost   = min_cost or 0.0
+        self.fee        = fee
+        # decimals of the step, to strip float noise from quantities
+        self.decimals   = max(-Decimal(repr(step)).normalize().as_tuple().exponent, 0)
+
+    def __repr__(self):
+        return (f"MarketRules({self.symbol!r}, step={self.step}, min_amount={self.min_amount}, "
+                f"min_cost={self.min_cost}, fee={self.fee})")
+
+def precision_step(precision, tick_size_mode):
+    """
+    A market precision as a step size: ccxt reports the step itself under
+    TICK_SIZE, and a digit count under DECIMAL_PLACES (older ccxt for Binance).
+    """
+    if precision is None:
+        return 1e-8
+    return float(precision) if tick_size_mode else 10.0 ** -int(precision)
+
+def build_rules(markets, tick_size_mode=True):
+    """{symbol: MarketRules} for every market; `tick_size_mode` as in ccxt's precisionMode == TICK_SIZE."""
+    rules = {}
+    for sym, m in markets.items():
+        limits = m.get("limits") or {}
+        rules[sym] = MarketRules(
+            sym,
+            precision_step((m.get("precision") or {}).get("amount"), tick_size_mode),
+            (limits.get("amount") or {}).get("min"),
+            (limits.get("cost") or {}).get("min"),
+            m.get("maker") if m.get("maker") is not None else FEE_RATE,
+        )
+    return rules
+
+# ─── SIZING ────────────────────────────────────────────────────────────────────
+def size_bands(rules, buy_prices, sell_prices, usd):
+    """
+    (buy_qty, sell_qty, min_usd) arrays for bands bought at `buy_prices` and
+    sold at `sell_prices` with `usd` per band.
+
+    sell_qty is the largest whole number of lots the budget buys after the
+    fee; buy_qty the fewest lots that still net it. Where the minimums can't
+    be met within `usd` both are 0; min_usd is what each band needs at least.
+    """
+    buy  = np.asarray(buy_prices, dtype=float)
+    sell = np.asarray(sell_prices, dtype=float)
+    step, keep = rules.step, 1.0 - rules.fee
+
+    def buy_lots(sell_lots):
+        return np.ceil(sell_lots / keep - EPS)
+
+    # Sell lots the budget covers, one fewer where rounding the buy up overshoots it
+    sell_lots = np.floor(usd / buy * keep / step + EPS)
+    sell_lots = np.where(buy_lots(sell_lots) * step * buy > usd * (1 + EPS), sell_lots - 1, sell_lots)
+
+    # Smallest lot count meeting every minimum on both legs
+    need = np.maximum.reduce([
+        np.full_like(buy, rules.min_amount),
+        rules.min_cost / sell,
+        rules.min_cost / buy * keep,
+    ])
+    min_lots = np.maximum(np.ceil(need / step - EPS), 1.0)
+
+    ok = sell_lots >= min_lots
+    buy_qty  = np.where(ok, np.round(buy_lots(sell_lots) * step, rules.decimals), 0.0)
+    sell_qty = np.where(ok, np.round(sell_lots * step, rules.decimals), 0.0)
+    min_usd  = buy_lots(min_lots) * step * buy
+    return buy_qty, sell_qty, min_usd
+
+def sell_quantity(rules, net, price):
+    """
+    `net` rounded down to whole lots, or 0.0 if that's under the market's
+    minimums at `price` (left as dust rather than sent and rejected).
+    """
+    qty = round(math.floor(net / rules.step + EPS) * rules.step, rules.decimals)
+    if qty <= 0 or qty < rules.min_amount or qty * price < rules.min_cost:
+        return 0.0
+    return qty
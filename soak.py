@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+soak.py
+
+Long-running soak test: bot cycles against a simulated market (sim_market.py)
+for days of simulated time, as fast as the bot can go.
+
+  • Every cycle advances the market by --step simulated seconds (default: the
+    shortest symbol interval in gridbot.toml), then runs bot.run_cycle()
+  • Every --sample-minutes of simulated time a sample is taken: RSS, open file
+    descriptors, sqlite file / -wal / -journal size, log size, error log
+    records, orders and trades the simulator holds, and cycle latency
+    percentiles (p50/p95/p99/max) over the window
+  • Samples go to soak/<run>/samples.jsonl next to the run's DB and log
+  • At the end, the post-warm-up trend of each resource is checked against
+    the limits below; anything over is flagged and the exit code is 1
+
+The bot runs in-process with its clock on simulated time, a throwaway DB and
+log, no rate budget and no retry back-off. Nothing touches the network.
+
+Usage:
+  ./soak.py --days 3
+  ./soak.py --days 14 --symbols BTC/USDT ETH/USDT --error-rate 0.01 --seed 7
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+from datetime import datetime
+
+log = logging.getLogger("soak")
+
+SOAK_DIR = "soak"
+
+# ─── LIMITS ────────────────────────────────────────────────────────────────────
+WARMUP_FRACTION     = 0.25    # early samples ignored by the trend checks
+RSS_MB_PER_DAY      = 5.0     # steady-state memory growth
+FD_GROWTH           = 2       # extra open descriptors over the run
+WAL_MB              = 64.0    # -wal / -journal that never gets checkpointed away
+DB_MB_PER_DAY       = 50.0
+LOG_MB_PER_DAY      = 200.0
+LATENCY_DEGRADATION = 1.5     # last-quarter p95 vs first post-warm-up quarter
+
+# ─── MEASURE ───────────────────────────────────────────────────────────────────
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # peak, not current, where /proc isn't available
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def open_fds():
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (q in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(max(int(round(q / 100.0 * len(ordered))) - 1, 0), len(ordered) - 1)]
+
+class ErrorCounter(logging.Handler):
+    """Counts ERROR and worse records from every logger."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+# ─── TRENDS ────────────────────────────────────────────────────────────────────
+def slope_per_day(samples, key):
+    """Least-squares slope of samples[key] against simulated days."""
+    points = [(s["sim_days"], s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 2:
+        return 0.0
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    var = sum((x - mx) ** 2 for x, _ in points)
+    return sum((x - mx) * (y - my) for x, y in points) / var if var else 0.0
+
+def check_trends(samples):
+    """
+    Flags for leaks and degradation in the post-warm-up samples:
+    [(check, message), ...], or None if there are too few samples to judge.
+    """
+    steady = samples[int(len(samples) * WARMUP_FRACTION):]
+    if len(steady) < 4:
+        return None
+    mb = 1024 * 1024
+    flags = []
+
+    rss = slope_per_day(steady, "rss") / mb
+    if rss > RSS_MB_PER_DAY:
+        flags.append(("rss", f"RSS grows {rss:.1f} MB/day (limit {RSS_MB_PER_DAY})"))
+
+    fds = [s["fds"] for s in steady if s["fds"] is not None]
+    if fds and max(fds[len(fds) // 2:]) - min(fds[:len(fds) // 2]) > FD_GROWTH:
+        flags.append(("fds", f"open descriptors went {min(fds)} → {fds[-1]}"))
+
+    for key in ("wal", "journal"):
+        worst = max(s[key] for s in steady) / mb
+        if worst > WAL_MB:
+            flags.append((key, f"-{key} reached {worst:.1f} MB (limit {WAL_MB})"))
+
+    db = slope_per_day(steady, "db") / mb
+    if db > DB_MB_PER_DAY:
+        flags.append(("db", f"DB grows {db:.1f} MB/day (limit {DB_MB_PER_DAY})"))
+
+    logs = slope_per_day(steady, "log") / mb
+    if logs > LOG_MB_PER_DAY:
+        flags.append(("log", f"log grows {logs:.1f} MB/day (limit {LOG_MB_PER_DAY})"))
+
+    quarter = max(len(steady) // 4, 1)
+    early = percentile([s["p95_ms"] for s in steady[:quarter] if s["p95_ms"] is not None], 50)
+    late  = percentile([s["p95_ms"] for s in steady[-quarter:] if s["p95_ms"] is not None], 50)
+    if early and late and late > early * LATENCY_DEGRADATION:
+        flags.append(("latency", f"cycle p95 went {early:.0f} ms → {late:.0f} ms"))
+    return flags
+
+# ─── RUN ───────────────────────────────────────────────────────────────────────
+def start_prices(config):
+    """Mid-grid starting price per symbol, so bands sit on both sides of it."""
+    from grid_format import load_grid
+
+    prices = {}
+    for sym, cfg in config.items():
+        levels = load_grid(os.path.join("grids", cfg["grid_file"])).levels
+        if len(levels) >= 2:
+            prices[sym] = float(levels[len(levels) // 2])
+    return prices
+
+def soak(days, step, sample_minutes, symbols, seed, error_rate, daily_vol):
+    workdir = os.path.join(SOAK_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}")
+    os.makedirs(workdir, exist_ok=True)
+    db_path  = os.path.join(workdir, "soak.sqlite3")
+    log_path = os.path.join(workdir, "soak.log")
+    os.environ.update({"GRIDBOT_DB": db_path, "GRIDBOT_LOG": log_path})
+
+    import clock
+    import sim_market
+    from bootstrap import setup_logging
+    from grid_config import get_config
+    import bot
+
+    setup_logging(bot.LOG_PATH)
+    # The bot's INFO lines go to the soak log only; progress goes to the console
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.WARNING)
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+
+    config = get_config()
+    for sym in [s for s in config if symbols and s not in symbols]:
+        config.pop(sym)
+    market = sim_market.SimulatedMarket(start_prices(config), seed=seed,
+                                        error_rate=error_rate, daily_vol=daily_vol)
+    sim_market.active_market = market
+    clock.set_source(lambda: market.now)
+    step = step or min(cfg["interval"] for cfg in config.values())
+
+    started, t0 = market.now, time.perf_counter()
+    samples, latencies = [], []
+    next_sample = started + sample_minutes * 60
+    print(f"Soaking {len(config)} symbol(s) for {days:g} simulated day(s), {step:g}s per cycle → {workdir}")
+    try:
+        with open(os.path.join(workdir, "samples.jsonl"), "w") as out:
+            while market.now - started < days * 86400:
+                market.advance(step)
+                begin = time.perf_counter()
+                bot.run_cycle()
+                latencies.append((time.perf_counter() - begin) * 1000)
+
+                if market.now < next_sample:
+                    continue
+                next_sample += sample_minutes * 60
+                orders, trades = market.retained()
+                sample = {
+                    "sim_days": round((market.now - started) / 86400, 4),
+                    "wall_s":   round(time.perf_counter() - t0, 2),
+                    "cycles":   len(latencies),
+                    "rss":      rss_bytes(),
+                    "fds":      open_fds(),
+                    "db":       file_size(db_path),
+                    "wal":      file_size(db_path + "-wal"),
+                    "journal":  file_size(db_path + "-journal"),
+                    "log":      file_size(log_path),
+                    "errors":   errors.count,
+                    "sim_orders": orders,
+                    "sim_trades": trades,
+                    "sim_calls":  market.calls,
+                    "p50_ms":   percentile(latencies, 50),
+                    "p95_ms":   percentile(latencies, 95),
+                    "p99_ms":   percentile(latencies, 99),
+                    "max_ms":   max(latencies),
+                }
+                latencies = []
+                samples.append(sample)
+                out.write(json.dumps(sample) + "\n")
+                out.flush()
+                print(f"day {sample['sim_days']:7.2f}  rss {sample['rss'] / 2**20:7.1f} MB  fds {sample['fds']}  "
+                      f"db {sample['db'] / 2**20:6.1f} MB  log {sample['log'] / 2**20:6.1f} MB  "
+                      f"p50/p95/p99 {sample['p50_ms']:.0f}/{sample['p95_ms']:.0f}/{sample['p99_ms']:.0f} ms  "
+                      f"errors {sample['errors']}")
+    finally:
+        bot.close_db()
+        clock.set_source(None)
+    return samples, workdir
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Soak the bot against a simulated market.")
+    parser.add_argument("--days", type=float, default=3.0, help="simulated days to run")
+    parser.add_argument("--step", type=float, help="simulated seconds per cycle (default: shortest interval)")
+    parser.add_argument("--sample-minutes", type=float, default=60.0, help="simulated minutes between samples")
+    parser.add_argument("--symbols", nargs="*", help="symbols to run (default: all of gridbot.toml)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.001, help="share of exchange calls that fail")
+    parser.add_argument("--vol", type=float, default=0.04, help="daily volatility of the simulated prices")
+    args = parser.parse_args()
+
+    samples, workdir = soak(args.days, args.step, args.sample_minutes, args.symbols,
+                            args.seed, args.error_rate, args.vol)
+    flags = check_trends(samples)
+    if flags is None:
+        print(f"Only {len(samples)} sample(s), too few for trend checks; run longer. Output in {workdir}")
+        return
+    for check, message in flags:
+        print(f"⚠️ {check}: {message}")
+    if flags:
+        print(f"Soak flagged {len(flags)} issue(s); samples, DB and log in {workdir}")
+        sys.exit(1)
+    print(f"Soak clean; samples, DB and log in {workdir}")
+
+if __name__ == "__main__":
+    main()
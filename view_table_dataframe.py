@@ -27,7 +27,7 @@ df = pd.read_sql_query(
            sell_cost,
            status
       FROM grid_pairs
-     WHERE status != 'completed'
+     WHERE status NOT IN ('completed', 'dust')
     """,
     conn,
     parse_dates=["buy_order_submitted", "buy_order_filled", "sell_order_submitted"]